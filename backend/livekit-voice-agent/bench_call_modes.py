@@ -0,0 +1,276 @@
+"""CPU cost per concurrent call, web mode vs telephony mode.
+
+Simulates N concurrent calls and pushes synthetic audio through the parts of
+the audio path that run in the agent process for each mode:
+
+- track audio decoded and resampled to the room input rate
+- noise cancellation (BVC for web, BVCTelephony for telephony)
+- resampling for the STT (web only, telephony reads at the STT rate)
+- Silero VAD at the mode's model rate
+- optionally (--eou) one end-of-turn inference per simulated user turn
+
+Noise cancellation runs in this process, inside the native AudioStream of a
+subscribed track, and the filter only works on tracks from a LiveKit Cloud
+room. So the benchmark has two ways to run:
+
+- room (LIVEKIT_URL, LIVEKIT_API_KEY and LIVEKIT_API_SECRET set): a
+  publisher subprocess joins a throwaway room and publishes one track per
+  call in real time; this process subscribes like the agent does and reads
+  each track through rtc.AudioStream with the mode's sample rate and noise
+  cancellation. Only this process is measured. Takes --seconds per mode.
+- offline (no credentials, or --offline): tracks are resampled locally and
+  noise cancellation is NOT included, so the numbers leave out the filter,
+  which is the largest per-call difference between the modes.
+
+Usage:
+    uv run bench_call_modes.py --calls 20 --seconds 30
+    uv run bench_call_modes.py --no-noise-cancellation   # room mode, filter off, for comparison
+    uv run bench_call_modes.py --eou   # needs `uv run agent.py download-files` first
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+from livekit import rtc
+
+import call_modes
+
+load_dotenv(".env.local")
+
+TRACK_SAMPLE_RATE = 48000
+FRAME_MS = 10
+INPUT_SAMPLE_RATE = {call_modes.WEB: 24000, call_modes.TELEPHONY: call_modes.STT_SAMPLE_RATE}
+# Seconds of audio between simulated end-of-turn checks
+TURN_SECONDS = 5.0
+PUBLISHER_IDENTITY = "bench-caller"
+
+
+def make_frames(seconds: float, seed: int) -> list:
+    """Alternating 1 s of speech-band noise and 1 s of near-silence at 48 kHz"""
+    rng = np.random.default_rng(seed)
+    samples_per_frame = TRACK_SAMPLE_RATE * FRAME_MS // 1000
+    frames = []
+    for idx in range(int(seconds * 1000 / FRAME_MS)):
+        loud = (idx * FRAME_MS // 1000) % 2 == 0
+        amplitude = 6000 if loud else 50
+        data = (rng.standard_normal(samples_per_frame) * amplitude).clip(-32768, 32767).astype(np.int16)
+        frames.append(rtc.AudioFrame(data.tobytes(), TRACK_SAMPLE_RATE, 1, samples_per_frame))
+    return frames
+
+
+def livekit_credentials():
+    creds = (os.getenv("LIVEKIT_URL"), os.getenv("LIVEKIT_API_KEY"), os.getenv("LIVEKIT_API_SECRET"))
+    return creds if all(creds) else None
+
+
+def room_token(identity: str, room_name: str) -> str:
+    from livekit import api
+
+    _, api_key, api_secret = livekit_credentials()
+    return api.AccessToken(api_key, api_secret) \
+        .with_identity(identity) \
+        .with_grants(api.VideoGrants(room_join=True, room=room_name)) \
+        .to_jwt()
+
+
+async def call_pipeline(mode: str, vad, input_frames, eou_runner) -> float:
+    """Agent-side processing of one call's input frames; returns seconds of audio processed"""
+    stt_resampler = None
+    if INPUT_SAMPLE_RATE[mode] != call_modes.STT_SAMPLE_RATE:
+        stt_resampler = rtc.AudioResampler(INPUT_SAMPLE_RATE[mode], call_modes.STT_SAMPLE_RATE)
+
+    vad_stream = vad.stream()
+
+    async def drain_vad():
+        async for _ in vad_stream:
+            pass
+
+    drain_task = asyncio.create_task(drain_vad())
+    eou_input = json.dumps({"chat_ctx": [
+        {"role": "assistant", "content": "Hi, how can I help you with your interior work today?"},
+        {"role": "user", "content": "I need a quote for a modular kitchen"},
+    ]}).encode()
+
+    audio_seconds = 0.0
+    next_turn = TURN_SECONDS
+    async for frame in input_frames:
+        vad_stream.push_frame(frame)
+        if stt_resampler is not None:
+            stt_resampler.push(frame)
+        audio_seconds += frame.samples_per_channel / frame.sample_rate
+        if eou_runner is not None and audio_seconds >= next_turn:
+            eou_runner.run(eou_input)
+            next_turn += TURN_SECONDS
+
+    vad_stream.end_input()
+    await drain_task
+    await vad_stream.aclose()
+    return audio_seconds
+
+
+async def offline_frames(mode: str, frames: list):
+    track_resampler = rtc.AudioResampler(TRACK_SAMPLE_RATE, INPUT_SAMPLE_RATE[mode])
+    for idx, frame in enumerate(frames):
+        for input_frame in track_resampler.push(frame):
+            yield input_frame
+        if idx % 10 == 0:
+            # Let the VAD task keep up, like a real-time stream would
+            await asyncio.sleep(0)
+
+
+async def stream_frames(stream: rtc.AudioStream):
+    async for event in stream:
+        yield event.frame
+
+
+def make_eou_runner(mode: str):
+    if mode == call_modes.TELEPHONY:
+        from livekit.plugins.turn_detector.english import _EUORunnerEn
+        runner = _EUORunnerEn()
+    else:
+        from livekit.plugins.turn_detector.multilingual import _EUORunnerMultilingual
+        runner = _EUORunnerMultilingual()
+    runner.initialize()
+    return runner
+
+
+async def run_offline(mode: str, vad, calls: int, seconds: float, eou_runner) -> float:
+    frames = [make_frames(seconds, seed) for seed in range(calls)]
+    processed = await asyncio.gather(*(
+        call_pipeline(mode, vad, offline_frames(mode, frames[i]), eou_runner) for i in range(calls)
+    ))
+    return sum(processed)
+
+
+async def run_in_room(mode: str, vad, calls: int, seconds: float, eou_runner, noise_cancellation: bool) -> float:
+    url = livekit_credentials()[0]
+    room_name = f"bench-call-modes-{os.getpid()}-{mode}"
+    room = rtc.Room()
+    tracks = []
+    all_subscribed = asyncio.Event()
+
+    @room.on("track_subscribed")
+    def on_track_subscribed(track, publication, participant):
+        if track.kind == rtc.TrackKind.KIND_AUDIO:
+            tracks.append(track)
+            if len(tracks) == calls:
+                all_subscribed.set()
+
+    await room.connect(url, room_token("bench-agent", room_name))
+    publisher = await asyncio.create_subprocess_exec(
+        sys.executable, os.path.abspath(__file__), "--publish", room_name,
+        "--calls", str(calls), "--seconds", str(seconds),
+    )
+    try:
+        await asyncio.wait_for(all_subscribed.wait(), timeout=30)
+        options = call_modes.noise_cancellation_options(mode) if noise_cancellation else None
+        streams = [
+            rtc.AudioStream.from_track(
+                track=track,
+                sample_rate=INPUT_SAMPLE_RATE[mode],
+                num_channels=1,
+                noise_cancellation=options,
+            )
+            for track in tracks
+        ]
+        pipelines = [
+            asyncio.create_task(call_pipeline(mode, vad, stream_frames(stream), eou_runner))
+            for stream in streams
+        ]
+        await publisher.wait()
+        for stream in streams:
+            await stream.aclose()
+        return sum(await asyncio.gather(*pipelines))
+    finally:
+        if publisher.returncode is None:
+            publisher.kill()
+        await room.disconnect()
+
+
+async def publish(room_name: str, calls: int, seconds: float):
+    """Publisher subprocess: one real-time synthetic caller track per call"""
+    room = rtc.Room()
+    await room.connect(livekit_credentials()[0], room_token(PUBLISHER_IDENTITY, room_name))
+    sources = []
+    for idx in range(calls):
+        source = rtc.AudioSource(TRACK_SAMPLE_RATE, 1)
+        track = rtc.LocalAudioTrack.create_audio_track(f"call-{idx}", source)
+        await room.local_participant.publish_track(
+            track, rtc.TrackPublishOptions(source=rtc.TrackSource.SOURCE_MICROPHONE)
+        )
+        sources.append(source)
+
+    async def feed(source: rtc.AudioSource, frames: list):
+        # capture_frame waits while the source's queue is full, which paces it to real time
+        for frame in frames:
+            await source.capture_frame(frame)
+        await source.wait_for_playout()
+
+    await asyncio.gather(*(feed(source, make_frames(seconds, seed)) for seed, source in enumerate(sources)))
+    await room.disconnect()
+
+
+async def bench_mode(mode: str, vads: dict, calls: int, seconds: float, eou: bool, in_room: bool,
+                     noise_cancellation: bool) -> dict:
+    eou_runner = make_eou_runner(mode) if eou else None
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    if in_room:
+        audio_seconds = await run_in_room(mode, vads[mode], calls, seconds, eou_runner, noise_cancellation)
+    else:
+        audio_seconds = await run_offline(mode, vads[mode], calls, seconds, eou_runner)
+    cpu_seconds = time.process_time() - cpu_start
+    wall_seconds = time.perf_counter() - wall_start
+
+    return {
+        "mode": mode,
+        "source": "room" if in_room else "offline",
+        "noise_cancellation": in_room and noise_cancellation,
+        "calls": calls,
+        "audio_seconds_per_call": round(audio_seconds / calls, 2),
+        "cpu_seconds": round(cpu_seconds, 3),
+        "wall_seconds": round(wall_seconds, 3),
+        # Share of one core a single real-time call needs
+        "cpu_percent_per_call": round(100 * cpu_seconds / audio_seconds, 3) if audio_seconds else None,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=10, help="concurrent calls per mode")
+    parser.add_argument("--seconds", type=float, default=20.0, help="seconds of audio per call")
+    parser.add_argument("--eou", action="store_true", help="include end-of-turn model inference")
+    parser.add_argument("--offline", action="store_true", help="don't use a LiveKit room even if credentials are set")
+    parser.add_argument("--no-noise-cancellation", dest="noise_cancellation", action="store_false",
+                        help="room mode without the noise filter")
+    parser.add_argument("--publish", metavar="ROOM", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.publish:
+        await publish(args.publish, args.calls, args.seconds)
+        return
+
+    in_room = not args.offline and livekit_credentials() is not None
+    if not in_room:
+        print("offline run: noise cancellation is not included (set LiveKit credentials to measure it)",
+              file=sys.stderr)
+    vads = call_modes.load_vads()
+    results = [
+        await bench_mode(mode, vads, args.calls, args.seconds, args.eou, in_room, args.noise_cancellation)
+        for mode in call_modes.MODES
+    ]
+    for result in results:
+        print(json.dumps(result))
+    web, telephony = results
+    if telephony["cpu_percent_per_call"]:
+        print(f"web / telephony CPU per call: {web['cpu_percent_per_call'] / telephony['cpu_percent_per_call']:.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,118 @@
+"""Per-call audio profiles for browser (web) and phone (telephony) callers.
+
+Phone audio arrives from the SIP gateway as 8 kHz narrowband speech, so the
+telephony profile avoids working on more bandwidth than the call has:
+
+- room input is read at 16 kHz, the native rate of the STT, so STT frames
+  need no further resampling (web reads at 24 kHz and resamples for STT)
+- Silero VAD runs its 8 kHz model, which is cheaper per window
+- room output is published at 16 kHz, the TTS rate, instead of being
+  upsampled to 24 kHz before the gateway takes it back down to 8 kHz
+- noise cancellation uses BVCTelephony, tuned for narrowband calls
+- turn detection uses the smaller English-only model
+
+The mode is picked per job, see ``detect_mode``.
+"""
+import json
+import logging
+import os
+
+from livekit import rtc
+from livekit.agents import RoomInputOptions, RoomOutputOptions
+# Importing the turn detector models registers their inference runners; this
+# has to happen in the worker's main process, so keep these imports at module level.
+# Silero and noise cancellation are only needed in job processes and are
+# imported from prewarm (see load_vads and load_noise_cancellation).
+from livekit.plugins.turn_detector.english import EnglishModel
+from livekit.plugins.turn_detector.multilingual import MultilingualModel
+
+logger = logging.getLogger("voice-agent")
+
+WEB = "web"
+TELEPHONY = "telephony"
+MODES = (WEB, TELEPHONY)
+
+# Force every call into one mode ("web" or "telephony"), e.g. for a SIP-only worker
+MODE_OVERRIDE = os.getenv("AGENT_CALL_MODE")
+# Metadata key (room or participant, JSON object) that selects the mode
+METADATA_KEY = "call_mode"
+
+# Sample rates of the inference STT and TTS
+STT_SAMPLE_RATE = 16000
+TTS_SAMPLE_RATE = 16000
+
+
+def _mode_from_metadata(metadata: str):
+    if not metadata:
+        return None
+    try:
+        data = json.loads(metadata)
+    except ValueError:
+        return None
+    mode = data.get(METADATA_KEY) if isinstance(data, dict) else None
+    return mode if mode in MODES else None
+
+
+def detect_mode(room_metadata: str, participant) -> str:
+    """Pick the call mode from, in order: AGENT_CALL_MODE, room metadata,
+    participant metadata, and finally whether the participant joined over SIP.
+    """
+    if MODE_OVERRIDE in MODES:
+        return MODE_OVERRIDE
+    mode = _mode_from_metadata(room_metadata)
+    if mode:
+        return mode
+    if participant is not None:
+        mode = _mode_from_metadata(participant.metadata)
+        if mode:
+            return mode
+        if participant.kind == rtc.ParticipantKind.PARTICIPANT_KIND_SIP:
+            return TELEPHONY
+    return WEB
+
+
+def load_vads() -> dict:
+    """Load the VAD model for every mode (blocking, call from prewarm)"""
+    from livekit.plugins import silero
+
+    return {
+        WEB: silero.VAD.load(),
+        TELEPHONY: silero.VAD.load(sample_rate=8000),
+    }
+
+
+def turn_detector(mode: str):
+    if mode == TELEPHONY:
+        return EnglishModel()
+    return MultilingualModel()
+
+
+def load_noise_cancellation():
+    """Import the noise cancellation plugin, which loads its native filter
+    library (blocking, call from prewarm so jobs don't pay for it)"""
+    from livekit.plugins import noise_cancellation
+
+    return noise_cancellation
+
+
+def noise_cancellation_options(mode: str):
+    """The mode's noise filter; it runs in this process on the subscribed track"""
+    noise_cancellation = load_noise_cancellation()
+    if mode == TELEPHONY:
+        return noise_cancellation.BVCTelephony()
+    return noise_cancellation.BVC()
+
+
+def room_input_options(mode: str) -> RoomInputOptions:
+    if mode == TELEPHONY:
+        return RoomInputOptions(
+            noise_cancellation=noise_cancellation_options(mode),
+            audio_sample_rate=STT_SAMPLE_RATE,
+        )
+    return RoomInputOptions(noise_cancellation=noise_cancellation_options(mode))
+
+
+def room_output_options(mode: str) -> RoomOutputOptions:
+    if mode == TELEPHONY:
+        return RoomOutputOptions(audio_sample_rate=TTS_SAMPLE_RATE)
+    return RoomOutputOptions()
@@ -0,0 +1,154 @@
+"""Barge-in settings and interruption reaction-time metrics for the voice agent.
+
+Reaction time is measured from the moment VAD reports the user speaking while
+the agent is talking, to the moment the agent stops talking (its audio is
+paused or the speech is interrupted). Candidates are only counted once the
+framework confirms them: either the agent's message is committed as
+interrupted, or a false interruption is reported.
+
+The framework reports these in a different order depending on the path:
+
+- pause (resume_false_interruption and pausable output): the agent goes
+  quiet first, then the message is committed as interrupted, or a false
+  interruption is reported (after the state is already back to speaking
+  when the speech resumes)
+- hard interrupt: the message is committed as interrupted first, then the
+  agent goes quiet
+- normal finish: the message is committed, then the agent goes quiet
+"""
+import logging
+import os
+
+logger = logging.getLogger("voice-agent")
+
+# Speech shorter than this doesn't interrupt the agent. Kept low so the agent
+# goes quiet fast; the false-interruption filter below covers coughs and noise.
+MIN_INTERRUPTION_DURATION = float(os.getenv("AGENT_MIN_INTERRUPTION_DURATION", "0.1"))
+# Interrupt only after the STT has heard this many words (0 = VAD only, fastest)
+MIN_INTERRUPTION_WORDS = int(os.getenv("AGENT_MIN_INTERRUPTION_WORDS", "0"))
+# If no real user turn follows an interruption within this many seconds it is
+# treated as a false interruption
+FALSE_INTERRUPTION_TIMEOUT = float(os.getenv("AGENT_FALSE_INTERRUPTION_TIMEOUT", "1.5"))
+# Pause the agent's audio on barge-in and resume it after a false interruption,
+# instead of throwing the reply away
+RESUME_FALSE_INTERRUPTION = os.getenv("AGENT_RESUME_FALSE_INTERRUPTION", "1") != "0"
+# Reaction times above this are counted as misses
+REACTION_TARGET_MS = float(os.getenv("AGENT_INTERRUPTION_TARGET_MS", "100"))
+
+
+def session_options() -> dict:
+    """Interruption keyword arguments for AgentSession"""
+    return {
+        "allow_interruptions": True,
+        "min_interruption_duration": MIN_INTERRUPTION_DURATION,
+        "min_interruption_words": MIN_INTERRUPTION_WORDS,
+        "false_interruption_timeout": FALSE_INTERRUPTION_TIMEOUT,
+        "resume_false_interruption": RESUME_FALSE_INTERRUPTION,
+    }
+
+
+class InterruptionTracker:
+    """Collects interruption reaction times from AgentSession events"""
+
+    def __init__(self, target_ms: float = REACTION_TARGET_MS, log: logging.Logger = logger):
+        self.target_ms = target_ms
+        self.log = log
+        self.reaction_times_ms = []
+        self.over_target = 0
+        self.false_interruptions = 0
+        self.resumed = 0
+        self._agent_speaking = False
+        self._user_started_at = None
+        self._candidate_ms = None
+        # How the current speech's message was committed: None, "interrupted" or "completed"
+        self._outcome = None
+        # Agent went quiet with a candidate and nothing has resolved it yet
+        self._paused = False
+
+    def attach(self, session):
+        session.on("user_state_changed", self.on_user_state_changed)
+        session.on("agent_state_changed", self.on_agent_state_changed)
+        session.on("agent_false_interruption", self.on_false_interruption)
+        session.on("conversation_item_added", self.on_conversation_item_added)
+
+    def on_user_state_changed(self, ev):
+        if ev.new_state == "speaking" and self._agent_speaking:
+            self._user_started_at = ev.created_at
+        elif ev.new_state != "speaking":
+            self._user_started_at = None
+
+    def on_agent_state_changed(self, ev):
+        if ev.new_state == "speaking":
+            if self._paused:
+                # Resumed after a pause; the false interruption event follows
+                # and still needs the candidate
+                self._paused = False
+            else:
+                self._candidate_ms = None
+            self._agent_speaking = True
+            self._user_started_at = None
+            self._outcome = None
+            return
+        if ev.old_state != "speaking":
+            return
+        self._agent_speaking = False
+        user_started_at = self._user_started_at
+        self._user_started_at = None
+        if self._outcome == "completed":
+            # The agent finished on its own; the user just started talking at the end
+            return
+        if user_started_at is not None:
+            self._candidate_ms = max(0.0, (ev.created_at - user_started_at) * 1000)
+        if self._outcome == "interrupted":
+            # Hard interrupt: the message was committed before the agent went quiet
+            self._commit("interrupted")
+        elif self._candidate_ms is not None:
+            self._paused = True
+
+    def on_false_interruption(self, ev):
+        self.false_interruptions += 1
+        if ev.resumed:
+            self.resumed += 1
+        # The agent still went quiet for the user, so the reaction counts
+        self._commit("false interruption, resumed" if ev.resumed else "false interruption")
+
+    def on_conversation_item_added(self, ev):
+        item = ev.item
+        if getattr(item, "role", None) != "assistant":
+            return
+        interrupted = getattr(item, "interrupted", False)
+        if self._agent_speaking:
+            # Committed before the agent went quiet; resolved on the state change
+            self._outcome = "interrupted" if interrupted else "completed"
+        elif interrupted:
+            self._commit("interrupted")
+        else:
+            self._candidate_ms = None
+            self._paused = False
+
+    def _commit(self, kind: str):
+        self._paused = False
+        if self._candidate_ms is None:
+            return
+        reaction_ms = self._candidate_ms
+        self._candidate_ms = None
+        self.reaction_times_ms.append(reaction_ms)
+        if reaction_ms > self.target_ms:
+            self.over_target += 1
+        self.log.info("[INTERRUPTION] %s: agent went quiet %.0f ms after the user started speaking", kind, reaction_ms)
+
+    def stats(self) -> dict:
+        times = sorted(self.reaction_times_ms)
+        if not times:
+            return {"count": 0, "false_interruptions": self.false_interruptions, "resumed": self.resumed}
+        return {
+            "count": len(times),
+            "avg_ms": round(sum(times) / len(times), 1),
+            "p50_ms": round(times[len(times) // 2], 1),
+            "p95_ms": round(times[min(len(times) - 1, int(len(times) * 0.95))], 1),
+            "max_ms": round(times[-1], 1),
+            "over_target": self.over_target,
+            "target_ms": self.target_ms,
+            "false_interruptions": self.false_interruptions,
+            "resumed": self.resumed,
+        }
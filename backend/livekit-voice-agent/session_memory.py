@@ -0,0 +1,289 @@
+"""Bounded chat context for long voice calls.
+
+Without this, every turn sends the whole call history to the LLM, so prompt
+size, LLM latency and memory all grow with the length of the call.
+``SessionMemory`` keeps the agent's chat context near a token budget:
+
+- tool outputs longer than ``tool_output_chars`` are clipped when they enter
+  the context
+- once the history is over budget, everything except the most recent
+  ``keep_recent`` items is summarized by the LLM in a background task and
+  replaced by one summary message; the turn that triggered it goes ahead with
+  the full history and doesn't wait for the summary
+- if summaries can't keep up (slow or failing LLM) and the history reaches
+  ``hard_limit`` times the budget, the oldest items are dropped on the spot
+
+Summaries use their own LLM instance. The session forwards the metrics of
+its own LLM as turn metrics, so sharing it would mix summary usage into the
+per-turn prompt sizes; summary usage is recorded as ``context_summary``
+records instead.
+
+Token counts are estimated at 4 characters per token, which is close enough
+for English speech to size the context without loading a tokenizer.
+"""
+import logging
+import os
+import time
+
+import psutil
+from livekit.agents import llm
+
+from asyncio_tools import SupervisedTaskGroup
+
+logger = logging.getLogger("voice-agent")
+
+# Target size of the chat history sent with each turn (instructions excluded)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("AGENT_CONTEXT_TOKEN_BUDGET", "2000"))
+# Most recent items that are always sent verbatim
+CONTEXT_KEEP_RECENT = int(os.getenv("AGENT_CONTEXT_KEEP_RECENT", "8"))
+# Drop the oldest items without waiting for a summary past this multiple of the budget
+CONTEXT_HARD_LIMIT = float(os.getenv("AGENT_CONTEXT_HARD_LIMIT", "1.5"))
+# Tool outputs are clipped to this many characters
+TOOL_OUTPUT_MAX_CHARS = int(os.getenv("AGENT_TOOL_OUTPUT_MAX_CHARS", "1000"))
+# LiveKit Inference model that writes the summaries
+SUMMARY_LLM = os.getenv("AGENT_SUMMARY_LLM", "openai/gpt-4.1-mini")
+
+CHARS_PER_TOKEN = 4
+# Per-item overhead of the chat format (role, separators)
+ITEM_OVERHEAD_TOKENS = 4
+SUMMARY_ID_PREFIX = "session_memory_summary_"
+
+SUMMARY_PROMPT = """You maintain the running summary of a customer support phone call for GetMyQuotation.
+
+Summarize the conversation below in at most 120 words. Keep what the assistant needs to continue the call: the customer's name and contact details if given, what they want (rooms, furniture, budget, timeline, location), answers already given, and anything still open. Leave out greetings and small talk. Write plain sentences."""
+
+
+def estimate_tokens(item) -> int:
+    if item.type == "message":
+        chars = sum(len(part) for part in item.content if isinstance(part, str))
+    elif item.type == "function_call":
+        chars = len(item.name) + len(item.arguments)
+    elif item.type == "function_call_output":
+        chars = len(item.output)
+    else:
+        chars = 0
+    return chars // CHARS_PER_TOKEN + ITEM_OVERHEAD_TOKENS
+
+
+def is_summary(item) -> bool:
+    return item.id.startswith(SUMMARY_ID_PREFIX)
+
+
+def _is_pinned(item) -> bool:
+    # Instructions stay put; earlier summaries are rolled into the next one
+    return item.type == "message" and item.role in ("system", "developer") and not is_summary(item)
+
+
+def _transcript_line(item) -> str:
+    if item.type == "message":
+        text = item.text_content or ""
+        if is_summary(item):
+            return text
+        speaker = "Customer" if item.role == "user" else "Assistant"
+        return f"{speaker}: {text}{' (interrupted)' if item.interrupted else ''}"
+    if item.type == "function_call":
+        return f"Assistant called {item.name}({item.arguments})"
+    return f"{item.name or 'Tool'} returned: {item.output}"
+
+
+class SessionMemory:
+    """Keeps one agent's chat context within a token budget"""
+
+    def __init__(
+        self,
+        token_budget: int = CONTEXT_TOKEN_BUDGET,
+        keep_recent: int = CONTEXT_KEEP_RECENT,
+        hard_limit: float = CONTEXT_HARD_LIMIT,
+        tool_output_chars: int = TOOL_OUTPUT_MAX_CHARS,
+        summary_llm=None,
+        sink=None,
+        record_base: dict = None,
+        log: logging.Logger = logger,
+    ):
+        self.token_budget = token_budget
+        self.keep_recent = keep_recent
+        self.hard_limit = hard_limit
+        self.tool_output_chars = tool_output_chars
+        self.sink = sink
+        self.record_base = record_base or {}
+        self.log = log
+
+        self.context_tokens = 0
+        self.peak_context_tokens = 0
+        self.context_items = 0
+        self.last_prompt_tokens = 0
+        self.peak_prompt_tokens = 0
+        self.summaries = 0
+        self.items_summarized = 0
+        self.items_dropped = 0
+        self.tool_outputs_clipped = 0
+        self.max_compact_ms = 0.0
+        self.peak_rss_mb = 0.0
+        self.summary_prompt_tokens = 0
+        self.summary_completion_tokens = 0
+
+        self._llm = summary_llm
+        self._summarizing = 0  # items in the summary being generated
+        self._summaries = SupervisedTaskGroup("context-summary", max_pending=1, log=log)
+        self._process = psutil.Process()
+
+    def attach(self, session):
+        if self._llm is None:
+            from livekit.agents import inference
+            self._llm = inference.LLM(SUMMARY_LLM)
+        self._llm.on("metrics_collected", self.on_summary_metrics)
+        session.on("metrics_collected", self.on_metrics_collected)
+
+    def on_metrics_collected(self, ev):
+        m = ev.metrics
+        # Only replies carry a speech id; anything else isn't a turn prompt
+        if m.type == "llm_metrics" and m.speech_id is not None:
+            self.last_prompt_tokens = m.prompt_tokens
+            self.peak_prompt_tokens = max(self.peak_prompt_tokens, m.prompt_tokens)
+
+    def on_summary_metrics(self, m):
+        self.summary_prompt_tokens += m.prompt_tokens
+        self.summary_completion_tokens += m.completion_tokens
+        if self.sink is not None:
+            self.sink.record({
+                **self.record_base,
+                "type": "context_summary",
+                "items_summarized": self._summarizing,
+                "llm_ttft_ms": round(m.ttft * 1000, 1),
+                "llm_duration_ms": round(m.duration * 1000, 1),
+                "usage": {
+                    "prompt_tokens": m.prompt_tokens,
+                    "prompt_cached_tokens": m.prompt_cached_tokens,
+                    "completion_tokens": m.completion_tokens,
+                },
+            })
+
+    async def compact(self, agent, turn_ctx: llm.ChatContext):
+        """Bring ``turn_ctx`` (the context for the reply about to be
+        generated) and the agent's own context back within budget.
+        Called from ``on_user_turn_completed``, so it must stay cheap."""
+        start = time.perf_counter()
+        items = list(turn_ctx.items)
+        changed = self._clip_tool_outputs(items)
+
+        history_tokens = sum(estimate_tokens(item) for item in items if not _is_pinned(item))
+        if history_tokens > self.token_budget:
+            older = self._older_items(items)
+            if older and not len(self._summaries):
+                self._summaries.spawn(self._summarize(agent, older))
+            if history_tokens > self.token_budget * self.hard_limit:
+                history_tokens = self._drop_oldest(items, history_tokens)
+                changed = True
+
+        if changed:
+            turn_ctx.items[:] = items
+            await agent.update_chat_ctx(turn_ctx)
+
+        self.context_tokens = history_tokens
+        self.context_items = len(items)
+        self.peak_context_tokens = max(self.peak_context_tokens, history_tokens)
+        rss_mb = self._process.memory_info().rss / (1024 * 1024)
+        self.peak_rss_mb = max(self.peak_rss_mb, rss_mb)
+        compact_ms = (time.perf_counter() - start) * 1000
+        self.max_compact_ms = max(self.max_compact_ms, compact_ms)
+        self.log.debug("[MEMORY] ~%d history tokens in %d items, last prompt %d tokens, rss %.1f MB (%.2f ms)",
+                       history_tokens, len(items), self.last_prompt_tokens, rss_mb, compact_ms)
+
+    def _clip_tool_outputs(self, items: list) -> bool:
+        changed = False
+        for i, item in enumerate(items):
+            if item.type == "function_call_output" and len(item.output) > self.tool_output_chars:
+                # The marker fits inside the cap, so a clipped output isn't clipped again
+                marker = f"... [{len(item.output)} chars, clipped]"
+                clipped = item.output[: max(0, self.tool_output_chars - len(marker))] + marker
+                items[i] = item.model_copy(update={"output": clipped})
+                self.tool_outputs_clipped += 1
+                changed = True
+        return changed
+
+    def _older_items(self, items: list) -> list:
+        """History items outside the recent window, oldest first"""
+        history = [item for item in items if not _is_pinned(item)]
+        split = max(0, len(history) - self.keep_recent)
+        # Don't separate tool outputs from the call that produced them
+        while split < len(history) and history[split].type == "function_call_output":
+            split += 1
+        return history[:split]
+
+    def _drop_oldest(self, items: list, history_tokens: int) -> int:
+        dropped = 0
+        for item in self._older_items(items):
+            if history_tokens <= self.token_budget:
+                break
+            # The running summary is all that's left of the turns before it
+            if is_summary(item):
+                continue
+            items.remove(item)
+            history_tokens -= estimate_tokens(item)
+            dropped += 1
+        # A function output without its call is rejected by the LLM API
+        while True:
+            first = next((item for item in items if not _is_pinned(item) and not is_summary(item)), None)
+            if first is None or first.type != "function_call_output":
+                break
+            items.remove(first)
+            history_tokens -= estimate_tokens(first)
+            dropped += 1
+        if dropped:
+            self.items_dropped += dropped
+            self.log.warning("[MEMORY] History over %.1fx budget, dropped the %d oldest items without a summary",
+                             self.hard_limit, dropped)
+        return history_tokens
+
+    async def _summarize(self, agent, older: list):
+        transcript = "\n".join(_transcript_line(item) for item in older)
+        summary_ctx = llm.ChatContext.empty()
+        summary_ctx.add_message(role="system", content=SUMMARY_PROMPT)
+        summary_ctx.add_message(role="user", content=transcript)
+        start = time.perf_counter()
+        self._summarizing = len(older)
+        stream = self._llm.chat(chat_ctx=summary_ctx)
+        summary = "".join([chunk async for chunk in stream.to_str_iterable()]).strip()
+        if not summary:
+            self.log.warning("[MEMORY] Empty summary, keeping history as is")
+            return
+
+        # The agent's context has moved on while the summary was generated:
+        # swap out only the items that were summarized
+        summarized_ids = {item.id for item in older}
+        ctx = agent.chat_ctx.copy()
+        items = [item for item in ctx.items if item.id not in summarized_ids and not is_summary(item)]
+        insert_at = next((i for i, item in enumerate(items) if not _is_pinned(item)), len(items))
+        self.summaries += 1
+        items.insert(insert_at, llm.ChatMessage(
+            id=f"{SUMMARY_ID_PREFIX}{self.summaries}",
+            role="system",
+            content=[f"Summary of the call so far: {summary}"],
+        ))
+        ctx.items = items
+        await agent.update_chat_ctx(ctx)
+        self.items_summarized += len(older)
+        self.log.info("[MEMORY] Summarized %d items into %d tokens in %.0f ms",
+                      len(older), len(summary) // CHARS_PER_TOKEN, (time.perf_counter() - start) * 1000)
+
+    async def aclose(self):
+        await self._summaries.aclose()
+
+    def stats(self) -> dict:
+        return {
+            "context_tokens": self.context_tokens,
+            "peak_context_tokens": self.peak_context_tokens,
+            "context_items": self.context_items,
+            "last_prompt_tokens": self.last_prompt_tokens,
+            "peak_prompt_tokens": self.peak_prompt_tokens,
+            "summaries": self.summaries,
+            "summary_failures": self._summaries.failed,
+            "summary_prompt_tokens": self.summary_prompt_tokens,
+            "summary_completion_tokens": self.summary_completion_tokens,
+            "items_summarized": self.items_summarized,
+            "items_dropped": self.items_dropped,
+            "tool_outputs_clipped": self.tool_outputs_clipped,
+            "max_compact_ms": round(self.max_compact_ms, 2),
+            "peak_rss_mb": round(self.peak_rss_mb, 1),
+            "token_budget": self.token_budget,
+        }
@@ -0,0 +1,6 @@
+import os
+import sys
+
+AGENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, AGENT_DIR)
+sys.path.insert(0, os.path.join(AGENT_DIR, "..", "shared"))
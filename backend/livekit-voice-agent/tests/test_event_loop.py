@@ -0,0 +1,151 @@
+"""The agent's session event handlers must not hold the job's event loop.
+
+Fake session events are fed through the handlers the entrypoint attaches
+(transcription publishing, turn records, interruption tracking, history
+compaction) while a LoopLagMonitor samples the loop every few milliseconds.
+"""
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+
+from asyncio_tools import LoopLagMonitor, SupervisedTaskGroup
+from interruptions import InterruptionTracker
+from session_memory import SessionMemory
+from test_session_memory import REPLY_TEXT, TURN_TEXT, FakeAgent, FakeLLM, new_context
+from transcriptions import TranscriptionPublisher
+from turn_records import TurnRecorder
+
+MAX_LOOP_LAG_MS = float(os.getenv("TEST_MAX_LOOP_LAG_MS", "50"))
+TURNS = 200
+
+
+class FakeSession:
+    """Just enough of AgentSession's event emitter for ``attach``"""
+
+    def __init__(self):
+        self.handlers = {}
+
+    def on(self, event, callback):
+        self.handlers.setdefault(event, []).append(callback)
+
+    def emit(self, event, ev):
+        for callback in self.handlers.get(event, []):
+            callback(ev)
+
+
+class FakeParticipant:
+    """Local participant whose publishes take ``delay`` seconds"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.published = []
+
+    async def publish_data(self, payload: bytes, reliable: bool = True):
+        await asyncio.sleep(self.delay)
+        self.published.append(payload)
+
+
+class FakeSink:
+    def __init__(self):
+        self.records = []
+
+    def record(self, record: dict):
+        self.records.append(record)
+
+
+def item_added(role: str, text: str, interrupted: bool = False):
+    item = SimpleNamespace(role=role, text_content=text, interrupted=interrupted)
+    return SimpleNamespace(item=item)
+
+
+def llm_metrics():
+    return SimpleNamespace(metrics=SimpleNamespace(
+        type="llm_metrics", speech_id="speech", ttft=0.3, duration=0.9,
+        prompt_tokens=900, prompt_cached_tokens=0, completion_tokens=40,
+    ))
+
+
+async def simulate_call(publish_delay: float, max_pending: int = 64) -> dict:
+    monitor = LoopLagMonitor(interval=0.005, threshold_ms=MAX_LOOP_LAG_MS)
+    monitor.start()
+
+    session = FakeSession()
+    participant = FakeParticipant(publish_delay)
+    publish_tasks = SupervisedTaskGroup("transcription-publish", max_pending=max_pending)
+    sink = FakeSink()
+    memory = SessionMemory(token_budget=500, keep_recent=4, summary_llm=FakeLLM(), sink=sink)
+    memory.attach(session)
+    tracker = InterruptionTracker()
+    tracker.attach(session)
+    TurnRecorder(sink, "job", "room", "web").attach(session)
+    TranscriptionPublisher(participant, publish_tasks).attach(session)
+    agent = FakeAgent(new_context())
+
+    start = time.perf_counter()
+    for n in range(TURNS):
+        t = time.time()
+        interrupted = n % 5 == 0
+        user_text = f"{n}: {TURN_TEXT}"
+        reply_text = f"{n}: {REPLY_TEXT}"
+
+        session.emit("user_state_changed", SimpleNamespace(new_state="speaking", created_at=t))
+        session.emit("user_state_changed", SimpleNamespace(new_state="listening", created_at=t + 0.5))
+        session.emit("conversation_item_added", item_added("user", user_text))
+
+        # on_user_turn_completed
+        agent.chat_ctx.add_message(role="user", content=user_text)
+        await memory.compact(agent, agent.chat_ctx.copy())
+
+        session.emit("metrics_collected", llm_metrics())
+        session.emit("agent_state_changed", SimpleNamespace(old_state="thinking", new_state="speaking", created_at=t + 1))
+        if interrupted:
+            session.emit("user_state_changed", SimpleNamespace(new_state="speaking", created_at=t + 1.5))
+            session.emit("agent_state_changed",
+                         SimpleNamespace(old_state="speaking", new_state="listening", created_at=t + 1.6))
+            session.emit("conversation_item_added", item_added("assistant", reply_text, interrupted=True))
+        else:
+            session.emit("conversation_item_added", item_added("assistant", reply_text))
+            session.emit("agent_state_changed",
+                         SimpleNamespace(old_state="speaking", new_state="listening", created_at=t + 2))
+        agent.chat_ctx.add_message(role="assistant", content=reply_text)
+        # Time to the next turn; real calls leave seconds
+        await asyncio.sleep(0.005)
+
+    handling_seconds = time.perf_counter() - start
+    await publish_tasks.aclose(timeout=0.1)
+    await memory.aclose()
+    monitor.stop()
+    return {
+        "lag": monitor.stats(),
+        "handling_seconds": handling_seconds,
+        "published": len(participant.published),
+        "dropped": publish_tasks.dropped,
+        "turn_records": sum(1 for record in sink.records if record["type"] == "turn"),
+        "interruptions": tracker.stats(),
+        "memory": memory.stats(),
+    }
+
+
+def test_session_handlers_keep_the_loop_responsive():
+    result = asyncio.run(simulate_call(publish_delay=0.002))
+
+    assert result["lag"]["samples"] > 0
+    assert result["lag"]["max_lag_ms"] < MAX_LOOP_LAG_MS, result["lag"]
+    assert result["dropped"] == 0
+    assert result["published"] == 2 * TURNS
+    assert result["turn_records"] == 2 * TURNS
+    assert result["interruptions"]["count"] == TURNS // 5
+    assert result["memory"]["summaries"] > 0
+    assert result["memory"]["peak_context_tokens"] <= 500 * 1.5
+
+
+def test_slow_publisher_drops_instead_of_blocking():
+    # Every publish takes a second: the handlers still return at once and
+    # the backlog is capped instead of growing with the call
+    result = asyncio.run(simulate_call(publish_delay=1.0, max_pending=8))
+
+    assert result["lag"]["max_lag_ms"] < MAX_LOOP_LAG_MS, result["lag"]
+    assert result["handling_seconds"] < 5
+    assert result["dropped"] > 0
+    assert result["published"] + result["dropped"] <= 2 * TURNS
@@ -0,0 +1,126 @@
+"""InterruptionTracker against the event orders livekit-agents 1.2 produces.
+
+- pause: agent goes quiet, then the message is committed as interrupted
+- resume: agent goes quiet, state returns to speaking, then the false
+  interruption is reported
+- hard interrupt: message committed as interrupted, then the agent goes quiet
+- normal finish: message committed, then the agent goes quiet
+"""
+import logging
+from types import SimpleNamespace
+
+import pytest
+
+from interruptions import InterruptionTracker
+
+
+class Replay:
+    """Feeds fake session events into a tracker"""
+
+    def __init__(self):
+        self.tracker = InterruptionTracker(target_ms=100, log=logging.getLogger("test-interruptions"))
+
+    def agent(self, old_state, new_state, at):
+        self.tracker.on_agent_state_changed(SimpleNamespace(old_state=old_state, new_state=new_state, created_at=at))
+
+    def user(self, new_state, at):
+        self.tracker.on_user_state_changed(SimpleNamespace(new_state=new_state, created_at=at))
+
+    def committed(self, interrupted):
+        item = SimpleNamespace(role="assistant", interrupted=interrupted, text_content="reply")
+        self.tracker.on_conversation_item_added(SimpleNamespace(item=item))
+
+    def false_interruption(self, resumed):
+        self.tracker.on_false_interruption(SimpleNamespace(resumed=resumed))
+
+    # One agent speech per helper; each starts at ``t`` and the user barges in at t + 1
+
+    def pause_then_interrupt(self, t, reaction):
+        self.agent("thinking", "speaking", t)
+        self.user("speaking", t + 1)
+        self.agent("speaking", "listening", t + 1 + reaction)
+        self.committed(interrupted=True)
+        self.user("listening", t + 2)
+
+    def pause_then_resume(self, t, reaction):
+        self.agent("thinking", "speaking", t)
+        self.user("speaking", t + 1)
+        self.agent("speaking", "listening", t + 1 + reaction)
+        self.user("listening", t + 1.2)
+        self.agent("listening", "speaking", t + 2.5)
+        self.false_interruption(resumed=True)
+        self.committed(interrupted=False)
+        self.agent("speaking", "listening", t + 4)
+
+    def hard_interrupt(self, t, reaction):
+        self.agent("thinking", "speaking", t)
+        self.user("speaking", t + 1)
+        self.committed(interrupted=True)
+        self.agent("speaking", "listening", t + 1 + reaction)
+        self.user("listening", t + 2)
+
+    def normal_finish_with_user_at_end(self, t):
+        self.agent("thinking", "speaking", t)
+        self.user("speaking", t + 1)
+        self.committed(interrupted=False)
+        self.agent("speaking", "listening", t + 1.02)
+        self.user("listening", t + 2)
+
+    def unresumed_false_interruption(self, t):
+        # Agent never went quiet for the user, so no reaction to count
+        self.agent("thinking", "speaking", t)
+        self.committed(interrupted=False)
+        self.agent("speaking", "listening", t + 1)
+        self.false_interruption(resumed=False)
+
+
+def reactions(replay):
+    return [round(ms) for ms in replay.tracker.reaction_times_ms]
+
+
+@pytest.mark.parametrize("path", ["pause_then_interrupt", "pause_then_resume", "hard_interrupt"])
+def test_each_path_records_one_reaction(path):
+    replay = Replay()
+    getattr(replay, path)(0, reaction=0.08)
+    assert reactions(replay) == [80]
+
+
+def test_resume_counts_false_interruption():
+    replay = Replay()
+    replay.pause_then_resume(0, reaction=0.04)
+    stats = replay.tracker.stats()
+    assert stats["false_interruptions"] == 1
+    assert stats["resumed"] == 1
+    assert stats["count"] == 1
+
+
+def test_normal_finish_records_nothing():
+    replay = Replay()
+    replay.normal_finish_with_user_at_end(0)
+    assert reactions(replay) == []
+
+
+def test_normal_finish_does_not_leak_into_a_false_interruption():
+    replay = Replay()
+    replay.normal_finish_with_user_at_end(0)
+    replay.unresumed_false_interruption(10)
+    assert reactions(replay) == []
+    assert replay.tracker.stats()["false_interruptions"] == 1
+
+
+@pytest.mark.parametrize("first", ["pause_then_interrupt", "pause_then_resume", "hard_interrupt"])
+@pytest.mark.parametrize("second", ["pause_then_interrupt", "pause_then_resume", "hard_interrupt"])
+def test_nothing_carries_over_between_turns(first, second):
+    replay = Replay()
+    getattr(replay, first)(0, reaction=0.09)
+    replay.normal_finish_with_user_at_end(10)
+    getattr(replay, second)(20, reaction=0.03)
+    assert reactions(replay) == [90, 30]
+    assert replay.tracker.over_target == 0
+
+
+def test_reaction_over_target_is_counted():
+    replay = Replay()
+    replay.hard_interrupt(0, reaction=0.25)
+    assert reactions(replay) == [250]
+    assert replay.tracker.over_target == 1
@@ -0,0 +1,160 @@
+"""History compaction: hard-limit drops, tool output clipping, long calls."""
+import asyncio
+
+from livekit.agents import llm
+
+from session_memory import SUMMARY_ID_PREFIX, SessionMemory, estimate_tokens, is_summary
+
+TURN_TEXT = "I would like to know about the prices for a wardrobe and a modular kitchen. " * 2
+REPLY_TEXT = "Wardrobes usually cost between fifty thousand and two lakh depending on size. " * 2
+
+
+class FakeLLM:
+    """Summarizer stand-in; ``stalled`` makes every summary hang"""
+
+    def __init__(self, stalled: bool = False):
+        self.stalled = stalled
+        self.calls = 0
+
+    def chat(self, chat_ctx):
+        self.calls += 1
+        return self
+
+    async def to_str_iterable(self):
+        if self.stalled:
+            await asyncio.Event().wait()
+        await asyncio.sleep(0.001)
+        yield "The customer wants a modular kitchen and a wardrobe in Noida, budget three lakh."
+
+    def on(self, event, callback):
+        pass
+
+
+class FakeAgent:
+    def __init__(self, ctx: llm.ChatContext):
+        self._ctx = ctx
+
+    @property
+    def chat_ctx(self):
+        return self._ctx
+
+    async def update_chat_ctx(self, ctx):
+        self._ctx = ctx.copy()
+
+
+def new_context(with_summary: bool = False) -> llm.ChatContext:
+    ctx = llm.ChatContext.empty()
+    ctx.add_message(role="system", content="You are a helpful support assistant.", id="lk.agent_task.instructions")
+    if with_summary:
+        ctx.add_message(role="system", content="Summary of the call so far: kitchen in Noida.", id=f"{SUMMARY_ID_PREFIX}1")
+    return ctx
+
+
+def add_turn(ctx: llm.ChatContext, n: int, tool_output: str = None):
+    ctx.add_message(role="user", content=f"{n}: {TURN_TEXT}")
+    if tool_output is not None:
+        ctx.insert(llm.FunctionCall(call_id=f"call_{n}", name="lookup_prices", arguments="{}"))
+        ctx.insert(llm.FunctionCallOutput(call_id=f"call_{n}", name="lookup_prices", output=tool_output, is_error=False))
+    ctx.add_message(role="assistant", content=f"{n}: {REPLY_TEXT}")
+
+
+def history_tokens(items) -> int:
+    return sum(estimate_tokens(item) for item in items if not (item.type == "message" and item.role == "system")
+               or is_summary(item))
+
+
+def test_drop_oldest_keeps_the_running_summary():
+    ctx = new_context(with_summary=True)
+    for n in range(30):
+        add_turn(ctx, n)
+    items = list(ctx.items)
+    memory = SessionMemory(token_budget=500, keep_recent=4, summary_llm=FakeLLM())
+
+    tokens = memory._drop_oldest(items, history_tokens(items))
+
+    assert tokens <= memory.token_budget
+    assert tokens == history_tokens(items)
+    assert items[0].id == "lk.agent_task.instructions"
+    assert is_summary(items[1])
+    # The oldest real turns went; what's left is the newest ones, in order
+    kept = [int(item.text_content.split(":")[0]) for item in items[2:]]
+    assert kept[0] > 0
+    assert kept[-1] == 29
+    assert kept == sorted(kept)
+    assert memory.items_dropped > 0
+
+
+def test_drop_oldest_never_leaves_a_tool_output_first():
+    ctx = new_context(with_summary=True)
+    for n in range(20):
+        add_turn(ctx, n, tool_output="price list")
+    items = list(ctx.items)
+    memory = SessionMemory(token_budget=300, keep_recent=4, summary_llm=FakeLLM())
+
+    memory._drop_oldest(items, history_tokens(items))
+
+    first_turn = next(item for item in items if not (item.type == "message" and item.role == "system"))
+    assert first_turn.type != "function_call_output"
+
+
+def test_older_items_keep_tool_output_with_its_call():
+    ctx = new_context()
+    add_turn(ctx, 0)
+    add_turn(ctx, 1, tool_output="price list")
+    items = list(ctx.items)
+    # With keep_recent=2 the window would start at the tool output
+    older = SessionMemory(keep_recent=2, summary_llm=FakeLLM())._older_items(items)
+    assert [item.type for item in older[-2:]] == ["function_call", "function_call_output"]
+
+
+def test_clip_tool_outputs_is_idempotent():
+    ctx = new_context()
+    add_turn(ctx, 0, tool_output="x" * 5000)
+    items = list(ctx.items)
+    memory = SessionMemory(tool_output_chars=1000, summary_llm=FakeLLM())
+
+    assert memory._clip_tool_outputs(items) is True
+    output = next(item for item in items if item.type == "function_call_output").output
+    assert len(output) <= 1000
+    assert output.endswith("[5000 chars, clipped]")
+    assert memory._clip_tool_outputs(items) is False
+    assert memory.tool_outputs_clipped == 1
+
+
+async def simulate_call(memory: SessionMemory, agent: FakeAgent, turns: int) -> list:
+    """Run ``turns`` user turns; returns the history size before each reply"""
+    sizes = []
+    for n in range(turns):
+        turn_ctx = agent.chat_ctx.copy()
+        await memory.compact(agent, turn_ctx)
+        sizes.append(memory.context_tokens)
+        add_turn(agent._ctx, n, tool_output="x" * 5000 if n % 10 == 0 else None)
+        # Give background summaries a chance to land between turns
+        await asyncio.sleep(0.002)
+    await memory.aclose()
+    return sizes
+
+
+def test_long_call_history_stays_bounded():
+    memory = SessionMemory(token_budget=2000, keep_recent=8, summary_llm=FakeLLM())
+    agent = FakeAgent(new_context())
+
+    sizes = asyncio.run(simulate_call(memory, agent, 300))
+
+    assert memory.summaries > 10
+    assert max(sizes) <= memory.token_budget * memory.hard_limit
+    # Flat over the call: the last hundred turns are no bigger than the first peak
+    assert max(sizes[200:]) <= max(sizes[:100]) * 1.2
+    assert sum(is_summary(item) for item in agent.chat_ctx.items) == 1
+
+
+def test_stalled_summaries_fall_back_to_drops_and_keep_the_summary():
+    memory = SessionMemory(token_budget=2000, keep_recent=8, summary_llm=FakeLLM(stalled=True))
+    agent = FakeAgent(new_context(with_summary=True))
+
+    sizes = asyncio.run(simulate_call(memory, agent, 100))
+
+    assert memory.summaries == 0
+    assert memory.items_dropped > 0
+    assert max(sizes) <= memory.token_budget * memory.hard_limit
+    assert any(is_summary(item) for item in agent.chat_ctx.items)
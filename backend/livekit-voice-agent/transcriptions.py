@@ -0,0 +1,85 @@
+"""Transcriptions for the frontend, published over the room's data channel.
+
+Both sides come from the committed conversation items. When the user barges
+in, the framework commits only the agent text that was actually played out
+and marks the message as interrupted, so the frontend never shows words the
+agent didn't say.
+
+``conversation_item_added`` is a sync event callback on the job's loop, so
+it only schedules the publish into the session's ``SupervisedTaskGroup``.
+"""
+import json
+import logging
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger("voice-agent")
+
+# The same text within this many seconds is treated as a duplicate
+DUPLICATE_WINDOW_SECONDS = 2.0
+# Entries older than this are forgotten
+RECENT_SECONDS = 5.0
+# Most recent transcriptions remembered for duplicate detection
+MAX_RECENT_TRANSCRIPTIONS = 64
+
+
+class TranscriptionPublisher:
+    def __init__(self, local_participant, tasks, log: logging.Logger = logger):
+        self.local_participant = local_participant
+        self.tasks = tasks
+        self.log = log
+        # {normalized text: last sent}, oldest first so expired entries are pruned from the front
+        self._recent = OrderedDict()
+
+    def attach(self, session):
+        session.on("conversation_item_added", self.on_conversation_item_added)
+
+    def on_conversation_item_added(self, event):
+        item = event.item
+        role = getattr(item, "role", None)
+        if role not in ("user", "assistant"):
+            return
+        text = item.text_content
+        if not (text and text.strip()):
+            return
+        if role == "user":
+            self.log.debug("[USER_SPEECH] Committed: %s", text[:100])
+            self.tasks.spawn(self.send("user", text))
+        else:
+            self.log.debug("[AGENT_SPEECH] Committed (interrupted=%s): %s", item.interrupted, text[:100])
+            self.tasks.spawn(self.send("agent", text, interrupted=item.interrupted))
+
+    def _is_duplicate(self, text: str) -> bool:
+        normalized_text = text.strip().lower()
+        now = time.time()
+        last_sent = self._recent.get(normalized_text)
+        if last_sent is not None and now - last_sent < DUPLICATE_WINDOW_SECONDS:
+            self.log.debug("[TRANSCRIPTION] Duplicate prevented: %s... (last sent %.2fs ago)", text[:50], now - last_sent)
+            return True
+
+        self._recent[normalized_text] = now
+        self._recent.move_to_end(normalized_text)
+        cutoff = now - RECENT_SECONDS
+        while self._recent:
+            oldest_text, oldest_sent = next(iter(self._recent.items()))
+            if oldest_sent >= cutoff and len(self._recent) <= MAX_RECENT_TRANSCRIPTIONS:
+                break
+            del self._recent[oldest_text]
+        return False
+
+    async def send(self, sender: str, text: str, interrupted: bool = False):
+        try:
+            if self._is_duplicate(text):
+                return
+            self.log.debug("[TRANSCRIPTION] Sending %s transcription: %s...", sender, text[:100])
+            payload = {
+                "type": "transcription",
+                "sender": sender,
+                "text": text,
+            }
+            if interrupted:
+                payload["interrupted"] = True
+            await self.local_participant.publish_data(json.dumps(payload).encode(), reliable=True)
+            self.log.debug("[TRANSCRIPTION] Successfully sent %s transcription", sender)
+        except Exception as e:
+            self.log.exception("Error sending transcription: %s", e)
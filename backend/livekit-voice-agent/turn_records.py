@@ -0,0 +1,49 @@
+"""Voice turn records for the analytics sink.
+
+Each committed conversation item becomes one record. Agent records carry the
+latencies and token usage reported through ``metrics_collected`` since the
+previous agent turn, and a finish reason of "interrupted" or "completed".
+"""
+
+
+class TurnRecorder:
+    def __init__(self, sink, session_id: str, room: str, call_mode: str):
+        self.sink = sink
+        self.base = {"type": "turn", "channel": "voice", "session_id": session_id, "room": room, "call_mode": call_mode}
+        self._pending = {}
+
+    def attach(self, session):
+        session.on("metrics_collected", self.on_metrics_collected)
+        session.on("conversation_item_added", self.on_conversation_item_added)
+
+    def on_metrics_collected(self, ev):
+        m = ev.metrics
+        # LLM calls outside a reply (no speech id) aren't part of this turn
+        if m.type == "llm_metrics" and m.speech_id is not None:
+            self._pending.update({
+                "llm_ttft_ms": round(m.ttft * 1000, 1),
+                "llm_duration_ms": round(m.duration * 1000, 1),
+                "usage": {
+                    "prompt_tokens": m.prompt_tokens,
+                    "prompt_cached_tokens": m.prompt_cached_tokens,
+                    "completion_tokens": m.completion_tokens,
+                },
+            })
+        elif m.type == "tts_metrics":
+            self._pending["tts_ttfb_ms"] = round(m.ttfb * 1000, 1)
+        elif m.type == "eou_metrics":
+            self._pending["end_of_utterance_delay_ms"] = round(m.end_of_utterance_delay * 1000, 1)
+            self._pending["transcription_delay_ms"] = round(m.transcription_delay * 1000, 1)
+
+    def on_conversation_item_added(self, ev):
+        item = ev.item
+        role = getattr(item, "role", None)
+        if role not in ("user", "assistant"):
+            return
+        text = item.text_content or ""
+        record = {**self.base, "role": role, "text": text}
+        if role == "assistant":
+            record["finish_reason"] = "interrupted" if item.interrupted else "completed"
+            record.update(self._pending)
+            self._pending = {}
+        self.sink.record(record)
@@ -0,0 +1,146 @@
+"""Event loop helpers shared by the voice agent and the token server.
+
+- LoopLagMonitor measures how late the loop wakes up from a timer, which is
+  how long some callback held the loop, and logs the slow ones.
+- SupervisedTaskGroup runs fire-and-forget coroutines started from sync event
+  callbacks: it keeps a reference to every task, bounds how many can pile up,
+  logs failures and cancels everything on shutdown.
+- setup_queue_logging moves log writes off the loop onto a listener thread.
+"""
+import asyncio
+import logging
+import logging.handlers
+import queue
+
+logger = logging.getLogger("asyncio-tools")
+
+
+class LoopLagMonitor:
+    """Periodically sleeps and reports how much later than asked it woke up"""
+
+    def __init__(self, interval: float = 0.25, threshold_ms: float = 100.0, log: logging.Logger = logger):
+        self.interval = interval
+        self.threshold_ms = threshold_ms
+        self.log = log
+        self.samples = 0
+        self.slow_count = 0
+        self.max_lag_ms = 0.0
+        self.total_lag_ms = 0.0
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            loop = asyncio.get_running_loop()
+            # In asyncio debug mode the loop also names the slow callback
+            loop.slow_callback_duration = self.threshold_ms / 1000
+            self._task = loop.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "samples": self.samples,
+            "slow_count": self.slow_count,
+            "max_lag_ms": round(self.max_lag_ms, 2),
+            "avg_lag_ms": round(self.total_lag_ms / self.samples, 2) if self.samples else 0.0,
+            "threshold_ms": self.threshold_ms,
+        }
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag_ms = max(0.0, (loop.time() - start - self.interval) * 1000)
+            self.samples += 1
+            self.total_lag_ms += lag_ms
+            self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+            if lag_ms > self.threshold_ms:
+                self.slow_count += 1
+                self.log.warning("event loop blocked for %.1f ms (threshold %.0f ms)", lag_ms, self.threshold_ms)
+
+
+class SupervisedTaskGroup:
+    """Bounded set of background tasks owned by one session.
+
+    ``spawn`` is safe to call from synchronous event handlers. When
+    ``max_pending`` tasks are already queued or running, new work is dropped
+    (and counted) instead of piling up behind a slow consumer. Tasks run at
+    most ``max_concurrency`` at a time, in the order they were spawned.
+    """
+
+    def __init__(self, name: str, max_pending: int = 64, max_concurrency: int = 1, log: logging.Logger = logger):
+        self.name = name
+        self.max_pending = max_pending
+        self.log = log
+        self.dropped = 0
+        self.failed = 0
+        self._tasks = set()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._closed = False
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def spawn(self, coro) -> bool:
+        """Schedule ``coro``; returns False if it was dropped"""
+        if self._closed or len(self._tasks) >= self.max_pending:
+            coro.close()
+            self.dropped += 1
+            if not self._closed:
+                self.log.warning("%s: %d tasks pending, dropping new work (%d dropped so far)",
+                                 self.name, len(self._tasks), self.dropped)
+            return False
+        task = asyncio.get_running_loop().create_task(self._run(coro))
+        self._tasks.add(task)
+        task.add_done_callback(self._on_done)
+        return True
+
+    async def _run(self, coro):
+        try:
+            async with self._semaphore:
+                return await coro
+        finally:
+            # Cancelled while still queued: close the coroutine that never started
+            coro.close()
+
+    def _on_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if task.cancelled():
+            return
+        exc = task.exception()
+        if exc is not None:
+            self.failed += 1
+            self.log.error("%s: background task failed", self.name, exc_info=exc)
+
+    def cancel_all(self):
+        """Stop accepting work and cancel everything still pending"""
+        self._closed = True
+        for task in list(self._tasks):
+            task.cancel()
+
+    async def aclose(self, timeout: float = 2.0):
+        """Let pending work finish for up to ``timeout`` seconds, then cancel the rest"""
+        self._closed = True
+        if self._tasks:
+            _, pending = await asyncio.wait(list(self._tasks), timeout=timeout)
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+
+def setup_queue_logging(log: logging.Logger, level: int = logging.INFO) -> logging.handlers.QueueListener:
+    """Route ``log`` through a queue so the loop never waits on stream writes"""
+    log_queue = queue.SimpleQueue()
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(process)d] %(name)s: %(message)s"))
+    listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    listener.start()
+    log.addHandler(logging.handlers.QueueHandler(log_queue))
+    log.setLevel(level)
+    log.propagate = False
+    return listener
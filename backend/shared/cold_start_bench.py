@@ -0,0 +1,117 @@
+"""Cold-start benchmark for the voice agent and the token server.
+
+Every run starts a fresh interpreter and times the stages a new worker goes
+through before it is useful:
+
+agent   import agent.py -> prewarm (VAD models, noise cancellation) ->
+        first job setup (room options, first VAD inference on 1 s of audio)
+server  import server.py -> app startup -> first /api/token -> first /api/chat
+
+The first job can't join a real room offline, so it stops at the work the
+entrypoint does before the session connects. /api/chat calls Azure OpenAI
+when credentials are configured and otherwise returns the setup message.
+
+Usage, from the service directory (so the service's environment is used):
+    uv run ../shared/cold_start_bench.py agent --runs 5
+    python ../shared/cold_start_bench.py server --runs 5
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+AGENT_STAGES = r'''
+import json, time
+t0 = time.perf_counter()
+import agent
+t1 = time.perf_counter()
+
+class _Proc:
+    userdata = {}
+
+proc = _Proc()
+agent.prewarm(proc)
+t2 = time.perf_counter()
+
+import asyncio
+import numpy as np
+from livekit import rtc
+import call_modes
+
+async def first_job():
+    for mode in call_modes.MODES:
+        call_modes.room_input_options(mode)
+        call_modes.room_output_options(mode)
+    stream = proc.userdata["vads"][call_modes.WEB].stream()
+    samples = np.zeros(480, dtype=np.int16).tobytes()
+    for _ in range(100):
+        stream.push_frame(rtc.AudioFrame(samples, 48000, 1, 480))
+    stream.end_input()
+    async for _ in stream:
+        pass
+    await stream.aclose()
+
+asyncio.run(first_job())
+t3 = time.perf_counter()
+print(json.dumps({"import": t1 - t0, "prewarm": t2 - t1, "first_job": t3 - t2, "total": t3 - t0}))
+'''
+
+SERVER_STAGES = r'''
+import json, os, time
+# Token signing is local, so placeholder credentials are enough to time it
+for name in ("LIVEKIT_API_KEY", "LIVEKIT_API_SECRET", "LIVEKIT_URL"):
+    os.environ.setdefault(name, "bench")
+t0 = time.perf_counter()
+import server
+t1 = time.perf_counter()
+
+import asyncio
+import httpx
+
+async def first_requests():
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        t_start = time.perf_counter()
+        async with server.lifespan(server.app):
+            t2 = time.perf_counter()
+            await client.get("/api/token")
+            t3 = time.perf_counter()
+            await client.post("/api/chat", json={"message": "Hi"})
+            t4 = time.perf_counter()
+    return t_start, t2, t3, t4
+
+t_start, t2, t3, t4 = asyncio.run(first_requests())
+print(json.dumps({
+    "import": t1 - t0,
+    "startup": t2 - t_start,
+    "first_token": t3 - t2,
+    "first_chat": t4 - t3,
+    "total": (t1 - t0) + (t4 - t_start),
+}))
+'''
+
+
+def run_once(code: str) -> dict:
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    if proc.returncode != 0:
+        sys.exit(f"benchmark run failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("service", choices=["agent", "server"])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    code = AGENT_STAGES if args.service == "agent" else SERVER_STAGES
+    runs = [run_once(code) for _ in range(args.runs)]
+    print(f"{args.service} cold start, median of {args.runs} fresh processes:")
+    for stage in runs[0]:
+        values = [run[stage] * 1000 for run in runs]
+        print(f"  {stage:<12} {statistics.median(values):>8.1f} ms  (min {min(values):.1f}, max {max(values):.1f})")
+
+
+if __name__ == "__main__":
+    main()
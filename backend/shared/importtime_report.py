@@ -0,0 +1,77 @@
+"""Report the slowest imports of a module.
+
+Runs ``python -X importtime -c "import <module>"`` in a fresh interpreter (the
+one running this script, so use the service's environment) and lists the
+modules with the largest cumulative and self import times.
+
+Usage, from the service directory:
+    uv run ../shared/importtime_report.py agent          # voice agent
+    python ../shared/importtime_report.py server --top 15  # token server
+"""
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+
+LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def profile_once(module: str) -> dict:
+    """{module: (self_us, cumulative_us, depth)} for one cold import"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        sys.exit(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    result = {}
+    for line in proc.stderr.splitlines():
+        match = LINE_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            result[name] = (int(self_us), int(cumulative_us), len(indent) // 2)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("module", help="module to import, e.g. agent or server")
+    parser.add_argument("--top", type=int, default=20, help="number of modules to list")
+    parser.add_argument("--runs", type=int, default=5, help="cold imports to take the median over")
+    parser.add_argument("--depth", type=int, default=None, help="only list modules up to this nesting depth")
+    args = parser.parse_args()
+
+    runs = [profile_once(args.module) for _ in range(args.runs)]
+    names = set(runs[0])
+    medians = {}
+    for name in names:
+        samples = [run[name] for run in runs if name in run]
+        medians[name] = (
+            statistics.median(s[0] for s in samples),
+            statistics.median(s[1] for s in samples),
+            samples[0][2],
+        )
+
+    total_ms = medians[args.module][1] / 1000 if args.module in medians else 0.0
+    print(f"import {args.module}: {total_ms:.0f} ms (median of {args.runs} cold imports)\n")
+
+    def listed(items):
+        if args.depth is not None:
+            items = [(name, value) for name, value in items if value[2] <= args.depth]
+        return items[:args.top]
+
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    by_cumulative = sorted(medians.items(), key=lambda kv: kv[1][1], reverse=True)
+    for name, (self_us, cumulative_us, depth) in listed(by_cumulative):
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {'  ' * depth}{name}")
+
+    print(f"\n{'self ms':>9}  module (largest own import time)")
+    by_self = sorted(medians.items(), key=lambda kv: kv[1][0], reverse=True)
+    for name, (self_us, _, _) in listed(by_self):
+        print(f"{self_us / 1000:>9.1f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
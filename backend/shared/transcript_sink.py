@@ -0,0 +1,275 @@
+"""Batched, append-only conversation analytics sink shared by both services.
+
+``TranscriptSink.record`` only appends a dict to an in-memory buffer, so the
+request and audio paths never wait on the disk. A background thread writes
+the buffer out in batches:
+
+- Each batch is appended to the current segment file as one gzip member of
+  JSON lines. Concatenated gzip members are still one valid ``.gz`` file, so
+  ``gzip.open`` / ``zcat`` read a segment like any compressed JSONL file.
+- A segment is written as ``<service>-<pid>-<start>.jsonl.gz.part`` and renamed
+  to ``.jsonl.gz`` when it is rotated (by size or age) or the sink closes.
+  Consumers should only read finished ``.jsonl.gz`` files.
+- If the disk is slow and the buffer reaches ``max_buffer`` records, new
+  records are dropped and counted; the count is written as a ``sink_dropped``
+  record with the next batch so the loss is visible in the data.
+- On start, ``.part`` segments left by processes that are no longer running
+  are truncated to their last complete batch and renamed, so a crash loses
+  at most the batches that were still in memory.
+- If the directory can't be used (e.g. a read-only deploy), ``start`` logs the
+  error and the sink stays disabled: ``record`` drops and counts everything,
+  and the service keeps serving.
+"""
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+
+logger = logging.getLogger("transcript-sink")
+
+DEFAULT_DIR = os.getenv(
+    "ANALYTICS_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "analytics"),
+)
+
+PART_SUFFIX = ".jsonl.gz.part"
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    if os.name == "nt":
+        # No cheap liveness check here; leave the segment for a POSIX host
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _complete_length(path: str, chunk_size: int = 64 * 1024) -> int:
+    """Byte length of the complete gzip members at the start of ``path``"""
+    with open(path, "rb") as f:
+        data = memoryview(f.read())
+    good = 0
+    pos = 0
+    while pos < len(data):
+        decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+        while not decompressor.eof and pos < len(data):
+            chunk = data[pos:pos + chunk_size]
+            pos += len(chunk)
+            try:
+                decompressor.decompress(chunk)
+            except zlib.error:
+                return good
+        if not decompressor.eof:
+            break
+        pos -= len(decompressor.unused_data)
+        good = pos
+    return good
+
+
+def recover_segments(directory: str, service: str) -> int:
+    """Finish ``.part`` segments of ``service`` whose writer is gone"""
+    recovered = 0
+    if not os.path.isdir(directory):
+        return recovered
+    prefix = f"{service}-"
+    for name in os.listdir(directory):
+        if not (name.startswith(prefix) and name.endswith(PART_SUFFIX)):
+            continue
+        try:
+            pid = int(name[len(prefix):].split("-", 1)[0])
+        except ValueError:
+            continue
+        if _pid_alive(pid):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            length = _complete_length(path)
+            if length == 0:
+                os.remove(path)
+                continue
+            with open(path, "r+b") as f:
+                f.truncate(length)
+            os.replace(path, path[: -len(".part")])
+            recovered += 1
+        except OSError as e:
+            logger.warning("Could not recover segment %s: %s", path, e)
+    return recovered
+
+
+class TranscriptSink:
+    """Buffers turn records in memory and appends them to disk in batches"""
+
+    def __init__(
+        self,
+        service: str,
+        directory: str = DEFAULT_DIR,
+        flush_interval: float = float(os.getenv("ANALYTICS_FLUSH_SECONDS", "2")),
+        max_batch: int = int(os.getenv("ANALYTICS_MAX_BATCH", "500")),
+        max_buffer: int = int(os.getenv("ANALYTICS_MAX_BUFFER", "10000")),
+        rotate_bytes: int = int(os.getenv("ANALYTICS_ROTATE_BYTES", str(64 * 1024 * 1024))),
+        rotate_seconds: float = float(os.getenv("ANALYTICS_ROTATE_SECONDS", "3600")),
+        fsync: bool = os.getenv("ANALYTICS_FSYNC", "0") != "0",
+    ):
+        self.service = service
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_buffer = max_buffer
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.fsync = fsync
+
+        self.disabled = False
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.last_flush_ms = 0.0
+
+        self._buffer = []
+        self._unreported_drops = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._segment_path = None
+        self._segment_started = 0.0
+        self._segment_bytes = 0
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None or self.disabled:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            if not os.access(self.directory, os.W_OK):
+                raise PermissionError(f"{self.directory} is not writable")
+            recovered = recover_segments(self.directory, self.service)
+        except OSError as e:
+            logger.error("Analytics disabled, can't use %s: %s", self.directory, e)
+            with self._lock:
+                self.disabled = True
+                self._closed = True
+            return
+        if recovered:
+            logger.info("Recovered %d unfinished %s segments", recovered, self.service)
+        self._thread = threading.Thread(target=self._run, name=f"{self.service}-transcript-sink", daemon=True)
+        self._thread.start()
+
+    def record(self, record: dict) -> bool:
+        """Queue one record; never blocks on I/O. Returns False if dropped."""
+        with self._lock:
+            if self._closed or len(self._buffer) >= self.max_buffer:
+                self.dropped += 1
+                self._unreported_drops += 1
+                return False
+            record.setdefault("ts", time.time())
+            record.setdefault("service", self.service)
+            self._buffer.append(record)
+            full = len(self._buffer) >= self.max_batch
+        if full:
+            self._wakeup.set()
+        return True
+
+    def flush_soon(self):
+        """Ask the writer thread to write what's buffered now"""
+        self._wakeup.set()
+
+    def close(self, timeout: float = 5.0):
+        """Write everything still buffered and finish the current segment"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            buffered = len(self._buffer)
+        return {
+            "disabled": self.disabled,
+            "buffered": buffered,
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+        }
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            with self._lock:
+                closed = self._closed
+            while self._write_batch():
+                pass
+            if closed:
+                self._finish_segment()
+                return
+            if self._segment_path and time.time() - self._segment_started >= self.rotate_seconds:
+                self._finish_segment()
+
+    def _take_batch(self) -> list:
+        with self._lock:
+            batch = self._buffer[: self.max_batch]
+            del self._buffer[: self.max_batch]
+            drops = self._unreported_drops
+            self._unreported_drops = 0
+        if drops:
+            batch.append({"type": "sink_dropped", "count": drops, "ts": time.time(), "service": self.service})
+        return batch
+
+    def _write_batch(self) -> bool:
+        """Write one batch; returns True if there may be more to write"""
+        batch = self._take_batch()
+        if not batch:
+            return False
+        start = time.perf_counter()
+        lines = "".join(json.dumps(record, ensure_ascii=False, default=str) + "\n" for record in batch)
+        member = gzip.compress(lines.encode("utf-8"), compresslevel=6)
+        try:
+            if self._segment_path is None:
+                self._open_segment()
+            with open(self._segment_path, "ab") as f:
+                f.write(member)
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+        except OSError as e:
+            # Keep the process alive; the records in this batch are lost
+            logger.error("Could not write %d analytics records: %s", len(batch), e)
+            with self._lock:
+                self.dropped += len(batch)
+            return False
+        self._segment_bytes += len(member)
+        self.written += len(batch)
+        self.batches += 1
+        self.last_flush_ms = (time.perf_counter() - start) * 1000
+        if self._segment_bytes >= self.rotate_bytes:
+            self._finish_segment()
+        return len(batch) >= self.max_batch
+
+    def _open_segment(self):
+        self._segment_started = time.time()
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(self._segment_started))
+        name = f"{self.service}-{os.getpid()}-{stamp}-{int(self._segment_started * 1000) % 1000:03d}{PART_SUFFIX}"
+        self._segment_path = os.path.join(self.directory, name)
+        self._segment_bytes = 0
+
+    def _finish_segment(self):
+        if self._segment_path is None:
+            return
+        try:
+            os.replace(self._segment_path, self._segment_path[: -len(".part")])
+        except OSError as e:
+            logger.error("Could not finish analytics segment %s: %s", self._segment_path, e)
+        self._segment_path = None
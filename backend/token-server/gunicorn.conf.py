@@ -0,0 +1,58 @@
+# Production serving config for the token server.
+#
+# Run from backend/token-server:
+#     gunicorn -c gunicorn.conf.py server:app
+#
+# Graceful reload (new workers start, old ones finish in-flight requests):
+#     kill -HUP $(cat $TOKEN_SERVER_PIDFILE)
+import multiprocessing
+import os
+import sys
+
+# Make the token server modules importable no matter where gunicorn was started
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import metrics  # noqa: E402
+
+bind = f"{os.getenv('TOKEN_SERVER_HOST', '0.0.0.0')}:{os.getenv('TOKEN_SERVER_PORT', '8000')}"
+workers = int(os.getenv("TOKEN_SERVER_WORKERS", multiprocessing.cpu_count()))
+worker_class = "serving.TokenServerWorker"
+
+# Every worker builds its own clients after fork; nothing is shared through
+# the master process.
+preload_app = False
+
+# Draining: on reload or shutdown, workers get this long to finish requests
+graceful_timeout = int(os.getenv("TOKEN_SERVER_GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("TOKEN_SERVER_WORKER_TIMEOUT", "60"))
+keepalive = int(os.getenv("TOKEN_SERVER_KEEPALIVE", "5"))
+
+# Recycle workers now and then so slow leaks can't build up
+max_requests = int(os.getenv("TOKEN_SERVER_MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.getenv("TOKEN_SERVER_MAX_REQUESTS_JITTER", "1000"))
+
+pidfile = os.getenv("TOKEN_SERVER_PIDFILE")
+
+
+def _instance_name(listeners) -> str:
+    # Bound port(s), or the socket path for unix sockets
+    names = []
+    for listener in listeners:
+        address = listener.sock.getsockname()
+        names.append(str(address[1]) if isinstance(address, tuple) else address.strip("/").replace("/", "_"))
+    return "-".join(names)
+
+
+def when_ready(server):
+    # The sockets are bound by now, so no other instance serves this address.
+    # Without TOKEN_SERVER_METRICS_DIR the metrics dir is named after it (even
+    # with a -b override), then snapshots from a previous run are dropped
+    # before any worker starts.
+    if not os.getenv("TOKEN_SERVER_METRICS_DIR"):
+        metrics.use_dir(metrics.default_dir(_instance_name(server.LISTENERS)))
+    metrics.reset_store()
+
+
+def child_exit(server, worker):
+    # Keep the exited worker's counts in the totals
+    metrics.retire_worker(worker.pid)
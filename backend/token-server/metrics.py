@@ -0,0 +1,220 @@
+"""Per-process request metrics for the token server.
+
+Each worker process counts its own requests in memory and periodically writes
+a snapshot to ``<metrics dir>/worker-<pid>.json``. The ``/metrics`` endpoint
+sums every snapshot in the directory, so a scrape that lands on any worker
+reports totals for the whole server instead of a single process.
+"""
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+
+
+def default_dir(instance: str) -> str:
+    """Metrics directory of one server instance (its port or socket), so
+    instances on the same host never read or clear each other's files"""
+    return os.path.join(tempfile.gettempdir(), f"token-server-metrics-{instance}")
+
+
+METRICS_DIR = os.getenv("TOKEN_SERVER_METRICS_DIR") or default_dir(os.getenv("TOKEN_SERVER_PORT", "8000"))
+FLUSH_INTERVAL = float(os.getenv("TOKEN_SERVER_METRICS_FLUSH_SECONDS", "5"))
+
+# Upper bounds (ms) of the latency histogram buckets. Histograms can be summed
+# across workers, averages and percentiles can't.
+LATENCY_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float("inf")]
+
+RETIRED_FILE = "retired.json"
+
+logger = logging.getLogger("token-server")
+
+_routes = {}  # {route: {"requests": n, "errors": n, "latency_ms_total": x, "latency_ms_max": x, "buckets": [...]}}
+_started_at = time.time()
+
+
+def _empty_route():
+    return {
+        "requests": 0,
+        "errors": 0,
+        "latency_ms_total": 0.0,
+        "latency_ms_max": 0.0,
+        "buckets": [0] * len(LATENCY_BUCKETS_MS),
+    }
+
+
+def record(route: str, status_code: int, duration_ms: float):
+    """Record one finished request in this process' counters"""
+    stats = _routes.get(route)
+    if stats is None:
+        stats = _routes[route] = _empty_route()
+    stats["requests"] += 1
+    if status_code >= 500:
+        stats["errors"] += 1
+    stats["latency_ms_total"] += duration_ms
+    if duration_ms > stats["latency_ms_max"]:
+        stats["latency_ms_max"] = duration_ms
+    for idx, bound in enumerate(LATENCY_BUCKETS_MS):
+        if duration_ms <= bound:
+            stats["buckets"][idx] += 1
+            break
+
+
+def snapshot() -> dict:
+    """Copy of this process' counters. Take it on the event loop (the
+    middleware updates the counters there); the copy can then be handed to
+    another thread."""
+    return {
+        "pid": os.getpid(),
+        "started_at": _started_at,
+        "written_at": time.time(),
+        "routes": {route: {**stats, "buckets": list(stats["buckets"])} for route, stats in _routes.items()},
+    }
+
+
+def _worker_path(pid: int) -> str:
+    return os.path.join(METRICS_DIR, f"worker-{pid}.json")
+
+
+def _write_json(path: str, data: dict):
+    # Write to a temp file and rename so readers never see a half-written file
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: str):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def flush():
+    """Write this process' snapshot to the shared metrics directory"""
+    _write_json(_worker_path(os.getpid()), snapshot())
+
+
+async def flush_periodically():
+    """Background task: flush the snapshot every FLUSH_INTERVAL seconds"""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(FLUSH_INTERVAL)
+        data = snapshot()
+        try:
+            await loop.run_in_executor(None, _write_json, _worker_path(data["pid"]), data)
+        except OSError as e:
+            logger.warning("Could not write metrics snapshot: %s", e)
+
+
+def _merge_routes(total: dict, routes: dict):
+    for route, stats in routes.items():
+        merged = total.setdefault(route, _empty_route())
+        merged["requests"] += stats["requests"]
+        merged["errors"] += stats["errors"]
+        merged["latency_ms_total"] += stats["latency_ms_total"]
+        merged["latency_ms_max"] = max(merged["latency_ms_max"], stats["latency_ms_max"])
+        merged["buckets"] = [a + b for a, b in zip(merged["buckets"], stats["buckets"])]
+
+
+def aggregate(own: dict) -> dict:
+    """Sum the snapshots of all live and retired workers.
+
+    ``own`` is this process' ``snapshot()``, used instead of its last flushed
+    file. Only files are read here, so this can run in an executor.
+    """
+    routes = {}
+    workers = []
+    own_file = os.path.basename(_worker_path(own["pid"]))
+    _merge_routes(routes, own["routes"])
+    workers.append(own["pid"])
+
+    if os.path.isdir(METRICS_DIR):
+        for name in os.listdir(METRICS_DIR):
+            if not name.endswith(".json") or name == own_file:
+                continue
+            data = _read_json(os.path.join(METRICS_DIR, name))
+            if not data:
+                continue
+            _merge_routes(routes, data.get("routes", {}))
+            if name != RETIRED_FILE:
+                workers.append(data.get("pid"))
+
+    for stats in routes.values():
+        stats["latency_ms_avg"] = stats["latency_ms_total"] / stats["requests"] if stats["requests"] else 0.0
+
+    return {
+        "workers": sorted(pid for pid in workers if pid is not None),
+        "latency_buckets_ms": [str(b) if b == float("inf") else b for b in LATENCY_BUCKETS_MS],
+        "routes": routes,
+    }
+
+
+def retire_worker(pid: int):
+    """Fold an exited worker's last snapshot into the retired totals.
+
+    Called from the gunicorn master, which is the only writer of RETIRED_FILE.
+    """
+    path = _worker_path(pid)
+    data = _read_json(path)
+    if data:
+        retired_path = os.path.join(METRICS_DIR, RETIRED_FILE)
+        retired = _read_json(retired_path) or {"routes": {}}
+        _merge_routes(retired["routes"], data.get("routes", {}))
+        _write_json(retired_path, retired)
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def use_dir(path: str):
+    """Point this process, and the workers it starts, at ``path``"""
+    global METRICS_DIR
+    METRICS_DIR = path
+    os.environ["TOKEN_SERVER_METRICS_DIR"] = path
+
+
+def reset_store():
+    """Clear snapshots left behind by a previous run of the server"""
+    if not os.path.isdir(METRICS_DIR):
+        return
+    for name in os.listdir(METRICS_DIR):
+        if name.endswith(".json") or name.endswith(".tmp"):
+            try:
+                os.remove(os.path.join(METRICS_DIR, name))
+            except OSError:
+                pass
+
+
+class MetricsMiddleware:
+    """ASGI middleware that times every HTTP request and records it by route"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router stores the matched route in the scope; fall back to a
+            # fixed key so unknown paths can't blow up the number of series.
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            record(route_path, status["code"], (time.perf_counter() - start) * 1000)
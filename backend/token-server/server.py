@@ -1,15 +1,138 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse
 from pydantic import BaseModel
-from livekit import api
+import atexit
 import os
+import sys
+import logging
+import threading
+import time
 from dotenv import load_dotenv
-from openai import OpenAI
+import asyncio
 import httpx
+from contextlib import asynccontextmanager
 
+import metrics
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared"))
+from asyncio_tools import LoopLagMonitor, setup_queue_logging  # noqa: E402
+from transcript_sink import TranscriptSink  # noqa: E402
+
+# Environment is read once at import; request handlers only use these constants
 load_dotenv("../livekit-voice-agent/.env.local")
 
-app = FastAPI()
+LIVEKIT_API_KEY = os.getenv("LIVEKIT_API_KEY")
+LIVEKIT_API_SECRET = os.getenv("LIVEKIT_API_SECRET")
+LIVEKIT_URL = os.getenv("LIVEKIT_URL")
+
+AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
+AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
+AZURE_OPENAI_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4o-mini")  # Default deployment name
+AZURE_OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")  # Default API version
+
+# Callbacks holding the loop longer than this get logged
+LOOP_LAG_THRESHOLD_MS = float(os.getenv("TOKEN_SERVER_LOOP_LAG_MS", "100"))
+
+# Log records are written by a background thread, never on the event loop.
+# The listener lives as long as the process (the lifespan can run more than
+# once, e.g. in tests); stopping it at exit writes out what is still queued.
+logger = logging.getLogger("token-server")
+log_listener = setup_queue_logging(logger)
+atexit.register(log_listener.stop)
+
+# Use orjson for JSON responses when it is installed (set TOKEN_SERVER_ORJSON=0 to disable)
+default_response_class = JSONResponse
+if os.getenv("TOKEN_SERVER_ORJSON", "1") != "0":
+    try:
+        import orjson  # noqa: F401
+        default_response_class = ORJSONResponse
+    except ImportError:
+        pass
+
+
+# livekit.api is the slowest import here and isn't needed to start serving,
+# and building the HTTP client (its SSL context) is blocking too. The warm-up
+# task does both in a thread right after startup. Handlers get them through
+# the async accessors below, which wait in a thread instead of importing on
+# the loop if a request arrives before the warm-up is done.
+_livekit_api = None
+_http_client = None
+_http_client_lock = threading.Lock()
+
+
+def livekit_api():
+    global _livekit_api
+    if _livekit_api is None:
+        from livekit import api
+        _livekit_api = api
+    return _livekit_api
+
+
+def get_http_client():
+    """Shared httpx client for this worker, created on first use.
+
+    One pooled client per worker: building a client (and its SSL context)
+    per request is blocking work on the loop.
+    """
+    global _http_client
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                _http_client = httpx.AsyncClient(timeout=30.0)
+    return _http_client
+
+
+async def livekit_api_ready():
+    """livekit.api, without blocking the loop while it is still importing"""
+    return _livekit_api or await asyncio.to_thread(livekit_api)
+
+
+async def http_client_ready():
+    """The shared httpx client, without building it on the loop"""
+    return _http_client or await asyncio.to_thread(get_http_client)
+
+
+def _warm_up():
+    # A failure here only costs the head start: the accessors retry on first
+    # use. Log it now, at startup, rather than when the task is awaited.
+    try:
+        livekit_api()
+        get_http_client()
+    except Exception:
+        logger.exception("Warm-up failed, clients will be built on first use")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Per-worker setup and teardown"""
+    metrics_flush_task = asyncio.create_task(metrics.flush_periodically())
+    app.state.loop_lag_monitor = LoopLagMonitor(threshold_ms=LOOP_LAG_THRESHOLD_MS, log=logger)
+    app.state.loop_lag_monitor.start()
+    warm_up_task = asyncio.create_task(asyncio.to_thread(_warm_up))
+    # Chat turns for analytics; start() scans the directory, so run it off the loop
+    app.state.transcript_sink = TranscriptSink("token-server")
+    await asyncio.to_thread(app.state.transcript_sink.start)
+    if not (AZURE_OPENAI_API_KEY and AZURE_OPENAI_ENDPOINT):
+        logger.warning("Azure OpenAI credentials not configured. Required: AZURE_OPENAI_API_KEY, AZURE_OPENAI_ENDPOINT")
+
+    yield
+
+    metrics_flush_task.cancel()
+    app.state.loop_lag_monitor.stop()
+    # Whatever the warm-up did, the teardown below must run
+    await asyncio.gather(warm_up_task, return_exceptions=True)
+    await asyncio.to_thread(app.state.transcript_sink.close)
+    if _http_client is not None:
+        await _http_client.aclose()
+    # Final snapshot so the master can fold this worker into the retired totals
+    try:
+        metrics.flush()
+    except OSError as e:
+        logger.warning("Could not write metrics snapshot: %s", e)
+
+
+app = FastAPI(default_response_class=default_response_class, lifespan=lifespan)
 
 # CORS middleware for web integration
 app.add_middleware(
@@ -20,23 +143,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-process request metrics, aggregated across workers by /metrics
+app.add_middleware(metrics.MetricsMiddleware)
+
+
 @app.get("/api/token")
 async def get_token(room_name: str = "voice-assistant", participant_name: str = "user"):
     """Generate a LiveKit access token for the client"""
     try:
-        # Get credentials from environment
-        api_key = os.getenv("LIVEKIT_API_KEY")
-        api_secret = os.getenv("LIVEKIT_API_SECRET")
-        livekit_url = os.getenv("LIVEKIT_URL")
-        
-        if not all([api_key, api_secret, livekit_url]):
+        if not all([LIVEKIT_API_KEY, LIVEKIT_API_SECRET, LIVEKIT_URL]):
             raise HTTPException(
                 status_code=500, 
                 detail="LiveKit credentials not configured. Check your .env.local file."
             )
         
         # Create token
-        token = api.AccessToken(api_key, api_secret) \
+        api = await livekit_api_ready()
+        token = api.AccessToken(LIVEKIT_API_KEY, LIVEKIT_API_SECRET) \
             .with_identity(participant_name) \
             .with_name(participant_name) \
             .with_grants(api.VideoGrants(
@@ -48,7 +171,7 @@ async def get_token(room_name: str = "voice-assistant", participant_name: str =
         
         return {
             "token": token.to_jwt(),
-            "url": livekit_url,
+            "url": LIVEKIT_URL,
             "room": room_name
         }
     except Exception as e:
@@ -59,6 +182,18 @@ async def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+async def get_metrics():
+    """Request counts and latencies summed over all worker processes"""
+    # Copy this worker's counters on the loop, where the middleware updates
+    # them; only the file reads go to the thread pool
+    own = metrics.snapshot()
+    result = await asyncio.get_running_loop().run_in_executor(None, metrics.aggregate, own)
+    result["event_loop"] = app.state.loop_lag_monitor.stats()  # this worker only
+    result["transcript_sink"] = app.state.transcript_sink.stats()  # this worker only
+    return result
+
+
 # Chatbot models
 class ChatMessage(BaseModel):
     message: str
@@ -69,46 +204,8 @@ class ChatResponse(BaseModel):
     response: str
 
 
-# Initialize Azure OpenAI client
-openai_client = None
-try:
-    azure_openai_api_key = os.getenv("AZURE_OPENAI_API_KEY")
-    azure_openai_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-    azure_openai_deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4o-mini")  # Default deployment name
-    azure_openai_api_version = os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")  # Default API version
-    
-    if azure_openai_api_key and azure_openai_endpoint:
-        # Construct the base URL for Azure OpenAI
-        # Format: https://{resource}.openai.azure.com/openai/deployments/{deployment}
-        base_url = f"{azure_openai_endpoint.rstrip('/')}/openai/deployments/{azure_openai_deployment}"
-        openai_client = OpenAI(
-            api_key=azure_openai_api_key,
-            base_url=base_url
-        )
-        print(f"Azure OpenAI client initialized with deployment: {azure_openai_deployment}")
-        print(f"Endpoint: {base_url}")
-    else:
-        print("Warning: Azure OpenAI credentials not configured. Check your .env.local file.")
-        print("Required: AZURE_OPENAI_API_KEY, AZURE_OPENAI_ENDPOINT")
-except Exception as e:
-    print(f"Warning: Azure OpenAI client not initialized: {e}")
-
-
-@app.post("/api/chat", response_model=ChatResponse)
-async def chat_endpoint(chat_request: ChatMessage):
-    """Handle chatbot messages using Azure OpenAI"""
-    try:
-        # Get credentials
-        azure_openai_api_key = os.getenv("AZURE_OPENAI_API_KEY")
-        azure_openai_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-        
-        if not azure_openai_api_key or not azure_openai_endpoint:
-            return ChatResponse(
-                response="I'm currently being set up. Please configure your Azure OpenAI credentials (AZURE_OPENAI_API_KEY, AZURE_OPENAI_ENDPOINT) in the .env.local file."
-            )
-        
-        # System prompt for the chatbot
-        system_prompt = """You are a helpful customer support assistant for GetMyQuotation, a platform that connects customers with verified suppliers for home interior and furniture needs.
+# System prompt for the chatbot
+SYSTEM_PROMPT = """You are a helpful customer support assistant for GetMyQuotation, a platform that connects customers with verified suppliers for home interior and furniture needs.
 
 Your role is to:
 - Help customers understand how to get quotes for interior work and furniture
@@ -119,8 +216,31 @@ Your role is to:
 
 Keep responses conversational and under 150 words unless more detail is needed."""
 
+
+def record_chat_turn(chat_request: ChatMessage, started: float, **fields):
+    """Queue one chat turn for the analytics sink (never waits on disk)"""
+    app.state.transcript_sink.record({
+        "type": "turn",
+        "channel": "chat",
+        "user_text": chat_request.message,
+        "history_length": len(chat_request.conversation_history),
+        "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+        **fields,
+    })
+
+
+@app.post("/api/chat", response_model=ChatResponse)
+async def chat_endpoint(chat_request: ChatMessage):
+    """Handle chatbot messages using Azure OpenAI"""
+    started = time.perf_counter()
+    try:
+        if not AZURE_OPENAI_API_KEY or not AZURE_OPENAI_ENDPOINT:
+            return ChatResponse(
+                response="I'm currently being set up. Please configure your Azure OpenAI credentials (AZURE_OPENAI_API_KEY, AZURE_OPENAI_ENDPOINT) in the .env.local file."
+            )
+        
         # Build conversation messages
-        messages = [{"role": "system", "content": system_prompt}]
+        messages = [{"role": "system", "content": SYSTEM_PROMPT}]
         
         # Add conversation history if provided
         for msg in chat_request.conversation_history[-10:]:  # Keep last 10 messages
@@ -132,72 +252,82 @@ Keep responses conversational and under 150 words unless more detail is needed."
         # Add current message
         messages.append({"role": "user", "content": chat_request.message})
         
-        # Call Azure OpenAI API directly using httpx
-        azure_openai_api_key = os.getenv("AZURE_OPENAI_API_KEY")
-        azure_openai_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-        azure_openai_deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
-        azure_openai_api_version = os.getenv("AZURE_OPENAI_API_VERSION")
+        # Call Azure OpenAI API directly using the shared httpx client
+        api_url = f"{AZURE_OPENAI_ENDPOINT.rstrip('/')}/openai/deployments/{AZURE_OPENAI_DEPLOYMENT}/chat/completions?api-version={AZURE_OPENAI_API_VERSION}"
+        logger.debug("Calling Azure OpenAI deployment %s", AZURE_OPENAI_DEPLOYMENT)
         
-        # Make the API call with api-version in the request
-        async with httpx.AsyncClient() as client:
-            api_url = f"{azure_openai_endpoint.rstrip('/')}/openai/deployments/{azure_openai_deployment}/chat/completions?api-version={azure_openai_api_version}"
-            print(f"Calling Azure OpenAI: {api_url}")
-            print(f"Deployment: {azure_openai_deployment}")
-            
-            response = await client.post(
-                api_url,
-                headers={
-                    "api-key": azure_openai_api_key,
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "messages": messages,
-                    "max_completion_tokens": 1000,
-                    "reasoning_effort": "low"  # For reasoning models: 'low', 'medium', or 'high'
-                },
-                timeout=30.0
-            )
-            response.raise_for_status()
-            result = response.json()
-            print(f"Azure OpenAI response: {result}")
-            
-            if "choices" not in result or len(result["choices"]) == 0:
-                raise ValueError("No choices in Azure OpenAI response")
-            
-            choice = result["choices"][0]
-            bot_response = choice["message"]["content"].strip() if choice["message"].get("content") else ""
-            
-            # Handle empty content (can happen with reasoning models)
-            if not bot_response:
-                finish_reason = choice.get("finish_reason", "unknown")
-                print(f"Warning: Empty content received. Finish reason: {finish_reason}")
-                if finish_reason == "length":
-                    bot_response = "I apologize, but my response was cut off due to token limits. Could you please rephrase your question more concisely, or I can help with a simpler query?"
-                else:
-                    bot_response = "I apologize, but I'm having trouble generating a response. Please try again or rephrase your question."
-            
-            print(f"Bot response extracted: {bot_response[:100]}...")
+        http_client = await http_client_ready()
+        upstream_started = time.perf_counter()
+        response = await http_client.post(
+            api_url,
+            headers={
+                "api-key": AZURE_OPENAI_API_KEY,
+                "Content-Type": "application/json"
+            },
+            json={
+                "messages": messages,
+                "max_completion_tokens": 1000,
+                "reasoning_effort": "low"  # For reasoning models: 'low', 'medium', or 'high'
+            },
+        )
+        upstream_ms = round((time.perf_counter() - upstream_started) * 1000, 1)
+        response.raise_for_status()
+        result = response.json()
+        logger.debug("Azure OpenAI response: %s", result)
+        
+        if "choices" not in result or len(result["choices"]) == 0:
+            raise ValueError("No choices in Azure OpenAI response")
         
+        choice = result["choices"][0]
+        bot_response = choice["message"]["content"].strip() if choice["message"].get("content") else ""
+        finish_reason = choice.get("finish_reason", "unknown")
+        model_text = bot_response
+        
+        # Handle empty content (can happen with reasoning models)
+        if not bot_response:
+            logger.warning("Empty content received. Finish reason: %s", finish_reason)
+            if finish_reason == "length":
+                bot_response = "I apologize, but my response was cut off due to token limits. Could you please rephrase your question more concisely, or I can help with a simpler query?"
+            else:
+                bot_response = "I apologize, but I'm having trouble generating a response. Please try again or rephrase your question."
+        
+        record_chat_turn(
+            chat_request, started,
+            status="ok",
+            response_text=bot_response,
+            empty_model_response=not model_text,
+            finish_reason=finish_reason,
+            upstream_ms=upstream_ms,
+            usage=result.get("usage"),
+            deployment=AZURE_OPENAI_DEPLOYMENT,
+        )
         return ChatResponse(response=bot_response)
         
         
     except httpx.HTTPStatusError as e:
         error_detail = f"Azure OpenAI API error: {e.response.status_code} - {e.response.text}"
-        print(f"Chat error: {error_detail}")
+        logger.error("Chat error: %s", error_detail)
+        record_chat_turn(chat_request, started, status="error", error=error_detail)
         raise HTTPException(
             status_code=500,
             detail=f"Error calling Azure OpenAI: {error_detail}"
         )
     except Exception as e:
         error_msg = str(e)
-        print(f"Chat error: {error_msg}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Chat error: %s", error_msg)
+        record_chat_turn(chat_request, started, status="error", error=error_msg)
         raise HTTPException(
             status_code=500,
             detail=f"Error processing chat message: {error_msg}"
         )
 
 if __name__ == "__main__":
+    # Single-process development server. For production use gunicorn.conf.py,
+    # which runs one worker per core.
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    config = uvicorn.Config(app, host="0.0.0.0", port=int(os.getenv("TOKEN_SERVER_PORT", "8000")))
+    # Bind first: if another instance already has the port, fail here
+    # instead of clearing its metrics
+    sock = config.bind_socket()
+    metrics.reset_store()
+    uvicorn.Server(config).run(sockets=[sock])
@@ -0,0 +1,16 @@
+"""Gunicorn worker class for running the token server on multiple cores.
+
+Used by ``gunicorn.conf.py``. The event loop and HTTP parser can be picked with
+environment variables; "auto" uses uvloop and httptools when they are installed
+and falls back to asyncio and h11 otherwise.
+"""
+import os
+
+from uvicorn.workers import UvicornWorker
+
+
+class TokenServerWorker(UvicornWorker):
+    CONFIG_KWARGS = {
+        "loop": os.getenv("TOKEN_SERVER_LOOP", "auto"),  # "auto", "uvloop" or "asyncio"
+        "http": os.getenv("TOKEN_SERVER_HTTP", "auto"),  # "auto", "httptools" or "h11"
+    }
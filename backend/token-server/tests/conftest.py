@@ -0,0 +1,18 @@
+import os
+import sys
+import tempfile
+
+TOKEN_SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, TOKEN_SERVER_DIR)
+sys.path.insert(0, os.path.join(TOKEN_SERVER_DIR, "..", "shared"))
+
+# server.py reads its configuration at import. Token signing is local, so
+# placeholder LiveKit credentials are enough; Azure is mocked per test.
+_scratch = tempfile.mkdtemp(prefix="token-server-tests-")
+os.environ["LIVEKIT_API_KEY"] = "test-key"
+os.environ["LIVEKIT_API_SECRET"] = "test-secret-that-is-at-least-32-bytes"
+os.environ["LIVEKIT_URL"] = "wss://test.livekit.invalid"
+os.environ["AZURE_OPENAI_API_KEY"] = ""
+os.environ["AZURE_OPENAI_ENDPOINT"] = ""
+os.environ["TOKEN_SERVER_METRICS_DIR"] = os.path.join(_scratch, "metrics")
+os.environ["ANALYTICS_DIR"] = os.path.join(_scratch, "analytics")
@@ -0,0 +1,148 @@
+"""No handler may hold the event loop longer than MAX_LOOP_LAG_MS.
+
+Requests are driven through httpx.ASGITransport, so the app runs on the test's
+own loop while a LoopLagMonitor samples it every few milliseconds.
+"""
+import asyncio
+import os
+
+import httpx
+import pytest
+
+import server
+from asyncio_tools import LoopLagMonitor, SupervisedTaskGroup
+
+MAX_LOOP_LAG_MS = float(os.getenv("TEST_MAX_LOOP_LAG_MS", "50"))
+CONCURRENT_REQUESTS = 20
+
+
+async def _upstream(request: httpx.Request) -> httpx.Response:
+    # Stand-in for Azure OpenAI: a little network latency, then a completion
+    await asyncio.sleep(0.02)
+    return httpx.Response(200, json={
+        "choices": [{"message": {"content": "We have 500+ verified suppliers."}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 120, "completion_tokens": 9},
+    })
+
+
+@pytest.fixture
+def mocked_azure(monkeypatch):
+    monkeypatch.setattr(server, "AZURE_OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(server, "AZURE_OPENAI_ENDPOINT", "https://azure.invalid")
+    monkeypatch.setattr(server, "_http_client", httpx.AsyncClient(transport=httpx.MockTransport(_upstream)))
+
+
+def run_with_monitor(method: str, path: str, **kwargs) -> tuple:
+    """Send CONCURRENT_REQUESTS requests, starting the moment the app is up.
+
+    Returns the responses and the loop lag stats. Starting right after
+    startup also covers requests that race the warm-up imports.
+    """
+    async def scenario():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            async with server.lifespan(server.app):
+                monitor = LoopLagMonitor(interval=0.005, threshold_ms=MAX_LOOP_LAG_MS)
+                monitor.start()
+                responses = await asyncio.gather(*(
+                    client.request(method, path, **kwargs) for _ in range(CONCURRENT_REQUESTS)
+                ))
+                # Let the monitor take a sample after the last response
+                await asyncio.sleep(0.05)
+                monitor.stop()
+        return responses, monitor.stats()
+
+    return asyncio.run(scenario())
+
+
+def assert_loop_not_blocked(stats: dict):
+    assert stats["samples"] > 0
+    assert stats["max_lag_ms"] < MAX_LOOP_LAG_MS, stats
+
+
+def test_token_does_not_block_loop():
+    responses, stats = run_with_monitor("GET", "/api/token", params={"room_name": "r", "participant_name": "p"})
+    assert all(r.status_code == 200 for r in responses)
+    assert all(r.json()["token"] for r in responses)
+    assert_loop_not_blocked(stats)
+
+
+def test_chat_does_not_block_loop(mocked_azure):
+    responses, stats = run_with_monitor("POST", "/api/chat", json={"message": "How many suppliers?"})
+    assert all(r.status_code == 200 for r in responses)
+    assert responses[0].json()["response"] == "We have 500+ verified suppliers."
+    assert_loop_not_blocked(stats)
+
+
+def test_metrics_does_not_block_loop():
+    responses, stats = run_with_monitor("GET", "/metrics")
+    assert all(r.status_code == 200 for r in responses)
+    assert "routes" in responses[0].json()
+    assert_loop_not_blocked(stats)
+
+
+def test_health_does_not_block_loop():
+    responses, stats = run_with_monitor("GET", "/health")
+    assert all(r.status_code == 200 for r in responses)
+    assert_loop_not_blocked(stats)
+
+
+def test_spawn_drops_work_past_max_pending():
+    async def scenario():
+        group = SupervisedTaskGroup("test", max_pending=2)
+        release = asyncio.Event()
+        ran = []
+
+        async def job(n):
+            await release.wait()
+            ran.append(n)
+
+        accepted = [group.spawn(job(n)) for n in range(4)]
+        assert accepted == [True, True, False, False]
+        assert group.dropped == 2
+        assert len(group) == 2
+        release.set()
+        await group.aclose()
+        return ran
+
+    assert asyncio.run(scenario()) == [0, 1]
+
+
+def test_cancel_all_cancels_pending_tasks():
+    async def scenario():
+        group = SupervisedTaskGroup("test", max_pending=4)
+        started = asyncio.Event()
+        finished = []
+
+        async def job():
+            started.set()
+            await asyncio.sleep(10)
+            finished.append(True)
+
+        group.spawn(job())
+        group.spawn(job())
+        tasks = list(group._tasks)
+        await started.wait()
+        group.cancel_all()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        assert all(task.cancelled() for task in tasks)
+        assert len(group) == 0
+        assert finished == []
+        # A closed group accepts no new work
+        assert group.spawn(job()) is False
+
+    asyncio.run(scenario())
+
+
+def test_failed_task_is_counted():
+    async def scenario():
+        group = SupervisedTaskGroup("test")
+
+        async def boom():
+            raise RuntimeError("boom")
+
+        group.spawn(boom())
+        await group.aclose()
+        return group.failed
+
+    assert asyncio.run(scenario()) == 1
@@ -0,0 +1,49 @@
+"""A failed warm-up is reported at startup and doesn't cut the teardown short."""
+import asyncio
+import logging
+import os
+
+import httpx
+
+import metrics
+import server
+from transcript_sink import TranscriptSink
+
+
+class ClosedSink(TranscriptSink):
+    closed = False
+
+    def close(self):
+        super().close()
+        ClosedSink.closed = True
+
+
+def test_failed_warm_up_is_logged_and_teardown_still_runs(tmp_path, monkeypatch, caplog):
+    def broken_livekit_api():
+        raise ImportError("livekit.api is broken")
+
+    http_client = httpx.AsyncClient()
+    monkeypatch.setattr(server, "logger", logging.getLogger("test-lifespan"))
+    monkeypatch.setattr(server, "livekit_api", broken_livekit_api)
+    monkeypatch.setattr(server, "_http_client", http_client)
+    monkeypatch.setattr(server, "TranscriptSink", lambda name: ClosedSink(name, directory=str(tmp_path)))
+    snapshot_path = os.path.join(metrics.METRICS_DIR, f"worker-{os.getpid()}.json")
+    if os.path.exists(snapshot_path):
+        os.remove(snapshot_path)
+
+    async def scenario():
+        async with server.lifespan(server.app):
+            # Let the warm-up thread finish while the app is up
+            for _ in range(100):
+                if "Warm-up failed" in caplog.text:
+                    break
+                await asyncio.sleep(0.01)
+            warned_while_running = "Warm-up failed" in caplog.text
+        return warned_while_running
+
+    with caplog.at_level(logging.ERROR, logger="test-lifespan"):
+        assert asyncio.run(scenario())
+
+    assert ClosedSink.closed
+    assert http_client.is_closed
+    assert os.path.exists(snapshot_path)
@@ -0,0 +1,38 @@
+"""Two token server instances on one host keep separate metrics."""
+import os
+import runpy
+import socket
+from types import SimpleNamespace
+
+import metrics
+
+GUNICORN_CONF = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gunicorn.conf.py")
+
+
+def test_instances_on_different_ports_do_not_share_metrics(monkeypatch, tmp_path):
+    monkeypatch.delenv("TOKEN_SERVER_METRICS_DIR")
+    monkeypatch.setattr(metrics, "METRICS_DIR", metrics.METRICS_DIR)
+    monkeypatch.setattr(metrics.tempfile, "gettempdir", lambda: str(tmp_path))
+    when_ready = runpy.run_path(GUNICORN_CONF)["when_ready"]
+
+    first, second = socket.socket(), socket.socket()
+    try:
+        first.bind(("127.0.0.1", 0))
+        second.bind(("127.0.0.1", 0))
+        first_port = first.getsockname()[1]
+
+        when_ready(SimpleNamespace(LISTENERS=[SimpleNamespace(sock=first)]))
+        first_dir = metrics.METRICS_DIR
+        metrics.flush()
+
+        monkeypatch.delenv("TOKEN_SERVER_METRICS_DIR")
+        when_ready(SimpleNamespace(LISTENERS=[SimpleNamespace(sock=second)]))
+        second_dir = metrics.METRICS_DIR
+    finally:
+        first.close()
+        second.close()
+
+    assert first_dir != second_dir
+    assert first_dir == os.path.join(str(tmp_path), f"token-server-metrics-{first_port}")
+    # Starting the second instance left the first one's snapshot alone
+    assert os.listdir(first_dir) == [f"worker-{os.getpid()}.json"]
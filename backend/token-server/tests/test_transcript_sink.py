@@ -0,0 +1,40 @@
+"""An unusable analytics directory must not stop the token server."""
+import asyncio
+import functools
+
+import httpx
+
+import server
+from transcript_sink import TranscriptSink
+
+
+def unusable_dir(tmp_path):
+    # A path below a regular file can't be created, whatever the permissions
+    blocker = tmp_path / "not-a-directory"
+    blocker.write_text("")
+    return str(blocker / "analytics")
+
+
+def test_sink_is_disabled_when_directory_is_unusable(tmp_path):
+    sink = TranscriptSink("test", directory=unusable_dir(tmp_path))
+    sink.start()
+    assert sink.disabled
+    assert sink.record({"type": "turn"}) is False
+    assert sink.stats()["dropped"] == 1
+    sink.close()
+
+
+def test_server_serves_with_unusable_analytics_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "TranscriptSink", functools.partial(TranscriptSink, directory=unusable_dir(tmp_path)))
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            async with server.lifespan(server.app):
+                chat = await client.post("/api/chat", json={"message": "Hi"})
+                metrics = await client.get("/metrics")
+        return chat, metrics
+
+    chat, metrics = asyncio.run(scenario())
+    assert chat.status_code == 200
+    assert metrics.json()["transcript_sink"]["disabled"] is True